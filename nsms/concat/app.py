@@ -0,0 +1,137 @@
+from rapidsms.apps.base import AppBase
+from rapidsms_httprouter.models import Message
+from django.core.cache import cache
+from django.conf import settings
+from nsms.concat.parts import split_part, MIN_PART_LENGTH
+from nsms.utils import handle_message
+
+# added to the count of parts of a message once we've given up on it, so parts still on their
+# way know they have to be passed on on their own
+RELEASED = 1000
+
+def get_window():
+    return getattr(settings, 'CONCAT_WINDOW', 300)
+
+def get_part_keys(key, total):
+    return ["%s_%d" % (key, index) for index in range(1, total + 1)]
+
+def get_done_key(message_id):
+    # set by whoever passes on a held part, so that it is only passed on once
+    return "nsms_concat_done_%d" % message_id
+
+def release_parts(key, total, message_id):
+    """
+    Passes the parts held under the passed in key on to our apps, each as its own message, unless
+    all of them arrived in the meantime.  message_id is the id of the first part that arrived,
+    so that we leave alone the parts of a later message which reuses the same key.
+    """
+    keys = get_part_keys(key, total)
+    if not message_id in [part[0] for part in cache.get_many(keys).values()]:
+        return
+
+    # claim the message, parts arriving from now on will pass themselves on
+    try:
+        count = cache.incr(key, RELEASED)
+    except ValueError:
+        return
+
+    cache.delete(key)
+    if count - RELEASED >= total:
+        return
+
+    # every part counted before our claim is stored by now, each is passed on by us or by itself
+    parts = cache.get_many(keys)
+    ids = []
+    for part_key in keys:
+        if part_key in parts and cache.add(get_done_key(parts[part_key][0]), 1, get_window() * 2):
+            ids.append(parts[part_key][0])
+    cache.delete_many(keys)
+
+    messages = Message.objects.in_bulk(ids)
+    for part_id in ids:
+        if part_id in messages:
+            handle_message(messages[part_id])
+
+class App(AppBase):
+    """
+    This app reassembles messages which were sent as several SMS parts before any other app
+    sees them, so that it needs to be the first app in your SMS_APPS.
+
+    Parts are recognized by the markers phones and aggregators add to them, ie: '(1/3)', on
+    messages at least CONCAT_MIN_PART_LENGTH long, 60 by default, bar the last part.  A last
+    part is only held if earlier parts of its message are, otherwise it is most likely a normal
+    message that happens to end in something like '(2/2)'.
+
+    Each part is held in our cache under its own key, per connection, and filtered so no other
+    app tries to handle it on its own.  Parts are counted atomically, and whichever part brings
+    the count to the total replaces its text by all the parts joined in order and carries on to
+    the rest of the apps.
+
+    When the first part arrives, a celery task is scheduled to run CONCAT_WINDOW seconds later,
+    300 by default.  If the rest of the message hasn't arrived by then, the parts we held are
+    passed on to the other apps as they were received.  Both your workers and celery need to
+    use the same cache, so use a shared cache backend.
+    """
+
+    def get_cache_key(self, message, total):
+        return "nsms_concat_%s_%d" % (message.connection.id, total)
+
+    def filter(self, message):
+        # this is one of the parts we held being passed on
+        if getattr(message, 'replayed', False):
+            return False
+
+        part = split_part(message.text, getattr(settings, 'CONCAT_MIN_PART_LENGTH', MIN_PART_LENGTH))
+        if not part:
+            return False
+
+        # we can only hold on to parts we can pass on later
+        db_message = getattr(message, 'db_message', None)
+        if db_message is None:
+            return False
+
+        (index, total, text) = part
+        window = get_window()
+        key = self.get_cache_key(message, total)
+
+        # a last part with no earlier part held, let it through as a normal message
+        if index == total:
+            count = cache.get(key)
+            if not count or count > RELEASED:
+                return False
+
+        # we already have this part, so this must be some other message, let it through as is
+        part_key = "%s_%d" % (key, index)
+        if not cache.add(part_key, (db_message.id, text.strip()), window * 2):
+            return False
+
+        # only count our part once it is stored, so that whoever sees the last count finds them all
+        cache.add(key, 0, window * 2)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # our count was released or expired between add and incr, start over
+            count = 1
+            cache.set(key, count, window * 2)
+
+        # we gave up on this message while this part was on its way, pass it on unless it was
+        # passed on along with the others
+        if count > RELEASED:
+            cache.delete(part_key)
+            return not cache.add(get_done_key(db_message.id), 1, window * 2)
+
+        # the first part, make sure the parts are passed on if the others never come
+        if count == 1:
+            from .tasks import release_concat_parts
+            release_concat_parts.apply_async(args=[key, total, db_message.id], countdown=window)
+
+        # still waiting on some parts, hold on to this one
+        if count < total:
+            return True
+
+        # we have everything, hand the whole message to the other apps
+        keys = get_part_keys(key, total)
+        parts = cache.get_many(keys)
+        cache.delete_many(keys + [key])
+        message.text = " ".join([parts[part_key][1] for part_key in keys if part_key in parts])
+        return False
@@ -0,0 +1,36 @@
+import re
+
+# part markers phones and aggregators put on concatenated messages, (1/3) or [1/3], either as the
+# first or the last word of the message
+START_MARKER_REGEX = re.compile(r'^\s*[\(\[](\d{1,2})/(\d{1,2})[\)\]](?:\s+|$)')
+END_MARKER_REGEX = re.compile(r'(?:^|\s+)[\(\[](\d{1,2})/(\d{1,2})[\)\]]\s*$')
+
+# every part but the last is split off a full SMS, so is at least this long, 67 characters for
+# unicode messages less the marker
+MIN_PART_LENGTH = 60
+
+def split_part(text, min_length=MIN_PART_LENGTH):
+    """
+    Returns a tuple of (part, total, text) if the passed in text is one part of a concatenated
+    message, with the marker removed from the text, otherwise None.
+
+    As normal messages can end in something like '(3/4)' too, a message only counts as a part
+    if it is at least min_length long, unless it is the last part.
+    """
+    match = START_MARKER_REGEX.match(text)
+    if match:
+        text = text[match.end():]
+    else:
+        match = END_MARKER_REGEX.search(text)
+        if not match:
+            return None
+        text = text[:match.start()]
+
+    (part, total) = [int(group) for group in match.groups()]
+    if total < 2 or part < 1 or part > total:
+        return None
+
+    if part < total and len(text.strip()) < min_length:
+        return None
+
+    return (part, total, text)
@@ -0,0 +1,9 @@
+from celery.task import task
+
+@task
+def release_concat_parts(key, total, message_id):
+    """
+    Passes the parts of a message which never arrived in full on to our apps, see nsms.concat.app
+    """
+    from .app import release_parts
+    release_parts(key, total, message_id)
@@ -0,0 +1,41 @@
+from django.test import TestCase
+from .parts import split_part
+
+# a part long enough to have been split off a full SMS
+LONG = "the quick brown fox jumps over the lazy dog while the cat sleeps on the mat"
+
+class SplitPartTest(TestCase):
+
+    def test_markers(self):
+        self.assertEquals((1, 3, LONG), split_part("(1/3) " + LONG))
+        self.assertEquals((1, 3, LONG), split_part("[1/3] " + LONG))
+        self.assertEquals((2, 3, LONG), split_part(LONG + " (2/3)"))
+        self.assertEquals((2, 3, LONG), split_part(LONG + " [2/3]  "))
+        self.assertEquals((12, 12, "thanks"), split_part("(12/12) thanks"))
+
+    def test_last_part(self):
+        # the last part can be as short as it likes
+        self.assertEquals((3, 3, "bye"), split_part("(3/3) bye"))
+        self.assertEquals((2, 2, "bye"), split_part("bye [2/2]"))
+        self.assertEquals((2, 2, ""), split_part("(2/2)"))
+
+    def test_not_parts(self):
+        self.assertEquals(None, split_part(LONG))
+        self.assertEquals(None, split_part("10/12: arrived at clinic"))
+        self.assertEquals(None, split_part("10/12: " + LONG))
+        self.assertEquals(None, split_part("stock 2 boxes (3/4)"))
+        self.assertEquals(None, split_part("(1/2) short"))
+
+        # the marker has to be a word of its own
+        self.assertEquals(None, split_part("(1/3)" + LONG))
+        self.assertEquals(None, split_part(LONG + "(2/3)"))
+        self.assertEquals(None, split_part("boxes (3/3)s"))
+
+        # nonsense counts
+        self.assertEquals(None, split_part("(1/1) " + LONG))
+        self.assertEquals(None, split_part("(0/3) " + LONG))
+        self.assertEquals(None, split_part("(4/3) " + LONG))
+
+    def test_min_length(self):
+        self.assertEquals((1, 2, "short"), split_part("(1/2) short", min_length=0))
+        self.assertEquals(None, split_part("(1/2) " + LONG, min_length=100))
@@ -0,0 +1,48 @@
+import csv
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from rapidsms.models import Backend
+from nsms.utils.contacts import import_contacts
+
+def decode_rows(reader):
+    for row in reader:
+        yield [unicode(value, 'utf-8') for value in row]
+
+class Command(BaseCommand):
+    args = "<csv file>"
+    help = "Imports contacts from a CSV file of phone number, name and language rows"
+
+    option_list = BaseCommand.option_list + (
+        make_option('--backend', dest='backend', default=None,
+                    help="The backend to create connections for, DEFAULT_BACKEND by default"),
+        make_option('--chunk-size', dest='chunk_size', type='int', default=1000,
+                    help="How many rows to import at a time"),
+        make_option('--header', action='store_true', dest='header', default=False,
+                    help="Skip the first row of the file"),
+        make_option('--no-users', action='store_false', dest='create_users', default=True,
+                    help="Don't create SMS Users accounts for the new connections"),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("Usage: import_contacts %s" % self.args)
+
+        backend_name = options['backend'] or getattr(settings, 'DEFAULT_BACKEND', 'console')
+        (backend, created) = Backend.objects.get_or_create(name=backend_name)
+
+        def progress(totals):
+            self.stdout.write("%(rows)d rows, %(created)d created, %(existing)d existing, %(invalid)d invalid\n" % totals)
+
+        csv_file = open(args[0], 'rb')
+        try:
+            reader = csv.reader(csv_file)
+            if options['header']:
+                next(reader, None)
+
+            totals = import_contacts(decode_rows(reader), backend, chunk_size=options['chunk_size'],
+                                     create_users=options['create_users'], progress=progress)
+        finally:
+            csv_file.close()
+
+        self.stdout.write("Done, %(created)d contacts created from %(rows)d rows\n" % totals)
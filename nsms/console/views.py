@@ -8,6 +8,8 @@ from smartmin.views import *
 from rapidsms.models import Backend
 from rapidsms_httprouter.models import Message
 from rapidsms_httprouter.router import get_router
+from nsms.utils import get_connection_identity
+from nsms.spam.prefilter import get_prefilter
 
 
 class MessageTesterForm(forms.Form):
@@ -115,8 +117,16 @@ class MessageCRUDL(SmartCRUDL):
             # valid form, then process the message
             form = MessageTesterForm(self.request.POST)
             if form.is_valid():
-                message = get_router().handle_incoming(form.cleaned_data.get('backend', 'tester'),
-                                                       form.cleaned_data['sender'],
+                backend = form.cleaned_data.get('backend', 'tester')
+                sender = form.cleaned_data['sender']
+
+                # dropped by our spam prefilter, nothing to show
+                if get_prefilter().drop(sender, form.cleaned_data['text']):
+                    return HttpResponseRedirect(reverse('console.message_list'))
+
+                # use the existing connection for this phone, whatever form it was created under
+                message = get_router().handle_incoming(backend,
+                                                       get_connection_identity(backend, sender),
                                                        form.cleaned_data['text'])
 
                 # and off we go
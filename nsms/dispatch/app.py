@@ -0,0 +1,126 @@
+from rapidsms.apps.base import AppBase
+from nsms.parser import KeywordSet
+from nsms.utils import get_message_context
+import traceback
+
+def get_app_keywords(app):
+    """
+    Returns the KeywordSet for the keywords the passed in app declares, or None if it declares none
+    """
+    keywords = getattr(app, 'keywords', None)
+    if keywords is None or isinstance(keywords, KeywordSet):
+        return keywords
+
+    return KeywordSet(keywords)
+
+class App(AppBase):
+    """
+    This app dispatches messages to the apps after it in your SMS_APPS by keyword, instead of
+    giving each of them a chance to handle every message in turn.  Apps declare the keywords
+    they own with a keywords attribute, either a list or a KeywordSet, ie:
+
+           class App(AppBase):
+               keywords = KeywordSet(['miles', 'car'], aliases=dict(m='miles'), fuzzy=True)
+
+    The first word of each message is looked up once, and only the app owning that keyword, if
+    any, and the apps without keywords are asked to handle it, in their SMS_APPS order.  No two
+    apps can own the same keyword.
+
+    Apps which need to see every message, such as spam or lang, can be put before this app.
+    As this app handles messages on behalf of the apps after it, it also runs their default
+    phase when none of them handled a message.
+
+    Our index is built when the router starts, so two apps declaring the same keyword stop the
+    router from starting instead of failing on every message.
+    """
+
+    def start(self):
+        self.build_dispatch()
+
+    def build_dispatch(self):
+        """
+        Builds our index of keyword to the apps to try, in order, raising a ValueError if two
+        apps use the same keyword
+        """
+        apps = list(self.router.apps)
+        apps = [(app, get_app_keywords(app)) for app in apps[apps.index(self) + 1:]]
+
+        owners = dict()
+        fuzzy = []
+        for (app, keywords) in apps:
+            if keywords is None:
+                continue
+
+            for word in keywords:
+                if word in owners:
+                    raise ValueError("Keyword '%s' is used by more than one app" % word)
+                owners[word] = app
+
+            if keywords.fuzzy:
+                fuzzy.append((keywords, app))
+
+        # for each keyword, the apps without keywords plus the owning app, in order
+        self.dispatch = dict()
+        for (word, owner) in owners.items():
+            self.dispatch[word] = [app for (app, keywords) in apps if app is owner or keywords is None]
+
+        self.fallback = [app for (app, keywords) in apps if keywords is None]
+        self.fuzzy = fuzzy
+        self.dispatched = [app for (app, keywords) in apps]
+
+    def get_dispatch(self):
+        """
+        Returns our index of keyword to the apps to try, building it if we weren't started
+        """
+        if getattr(self, 'dispatch', None) is None:
+            self.build_dispatch()
+
+        return self.dispatch
+
+    def get_apps(self, keyword):
+        """
+        Returns the apps to try for the passed in keyword
+        """
+        dispatch = self.get_dispatch()
+        if not keyword:
+            return self.fallback
+
+        apps = dispatch.get(keyword)
+        if apps is None:
+            for (keywords, app) in self.fuzzy:
+                # the app counts the typo when it parses the message itself
+                word = keywords.get_fuzzy(keyword, count=False)
+                if word:
+                    apps = dispatch[word]
+                    break
+            else:
+                apps = self.fallback
+
+        return apps
+
+    def call(self, app, phase, message):
+        """
+        Runs the passed in phase of the passed in app, catching any exception the same way the
+        router does, so one failing app doesn't make the router run the others a second time
+        """
+        try:
+            return getattr(app, phase)(message)
+        except Exception:
+            traceback.print_exc()
+            app.exception()
+            return False
+
+    def handle(self, message):
+        keyword = get_message_context(message).keyword
+
+        for app in self.get_apps(keyword):
+            if self.call(app, 'handle', message) is True:
+                return True
+
+        # nobody handled it, give our apps their default phase
+        for app in self.dispatched:
+            if self.call(app, 'default', message) is True:
+                return True
+
+        # we've taken care of all the apps after us, don't let them see this message again
+        return True
@@ -0,0 +1,126 @@
+from django.test import TestCase
+from nsms.parser import KeywordSet
+from .app import App
+
+class Router(object):
+    def __init__(self):
+        self.apps = []
+
+class FakeApp(object):
+    """
+    Records the messages it is asked to handle, in a log shared by all our apps
+    """
+    def __init__(self, name, log, keywords=None, handles=False, defaults=False, fails=False):
+        self.name = name
+        self.log = log
+        self.handles = handles
+        self.defaults = defaults
+        self.fails = fails
+        self.exceptions = 0
+        if keywords is not None:
+            self.keywords = keywords
+
+    def handle(self, message):
+        self.log.append(('handle', self.name))
+        if self.fails:
+            raise Exception("failed")
+        return self.handles
+
+    def default(self, message):
+        self.log.append(('default', self.name))
+        return self.defaults
+
+    def exception(self):
+        self.exceptions += 1
+
+class Message(object):
+    def __init__(self, text):
+        self.text = text
+
+class DispatchTest(TestCase):
+
+    def build(self, *apps):
+        router = Router()
+        dispatch = App(router)
+        router.apps = [dispatch] + list(apps)
+        dispatch.start()
+        return dispatch
+
+    def handled(self, dispatch, text, log):
+        del log[:]
+        self.assertTrue(dispatch.handle(Message(text)))
+        return list(log)
+
+    def test_keywords(self):
+        log = []
+        miles = FakeApp('miles', log, KeywordSet(['miles'], aliases=dict(m='miles')), handles=True)
+        car = FakeApp('car', log, ['car'], handles=True)
+        dispatch = self.build(miles, car)
+
+        self.assertEquals([('handle', 'miles')], self.handled(dispatch, "miles 120", log))
+        self.assertEquals([('handle', 'miles')], self.handled(dispatch, "M 120", log))
+        self.assertEquals([('handle', 'car')], self.handled(dispatch, "car RAB123CD", log))
+
+    def test_order(self):
+        log = []
+        first = FakeApp('first', log)
+        miles = FakeApp('miles', log, ['miles'])
+        car = FakeApp('car', log, ['car'])
+        last = FakeApp('last', log, handles=True)
+        dispatch = self.build(first, miles, car, last)
+
+        # apps without keywords see every message, all in their SMS_APPS order
+        self.assertEquals([('handle', 'first'), ('handle', 'miles'), ('handle', 'last')],
+                          self.handled(dispatch, "miles 120", log))
+        self.assertEquals([('handle', 'first'), ('handle', 'last')],
+                          self.handled(dispatch, "hello", log))
+        self.assertEquals([('handle', 'first'), ('handle', 'last')],
+                          self.handled(dispatch, "", log))
+
+        # the first app to handle it stops the others
+        first.handles = True
+        self.assertEquals([('handle', 'first')], self.handled(dispatch, "miles 120", log))
+
+    def test_fuzzy(self):
+        log = []
+        keywords = KeywordSet(['miles', 'car'], fuzzy=True)
+        mileage = FakeApp('mileage', log, keywords, handles=True)
+        other = FakeApp('other', log, ['lang'], handles=True)
+        dispatch = self.build(other, mileage)
+
+        self.assertEquals([('handle', 'mileage')], self.handled(dispatch, "mlies 120", log))
+        self.assertEquals([('handle', 'mileage')], self.handled(dispatch, "cra RAB123CD", log))
+
+        # the app counts its typos itself when it parses the message
+        self.assertEquals(0, keywords.fuzzy_hits)
+        self.assertEquals(0, keywords.fuzzy_misses)
+
+    def test_conflict(self):
+        log = []
+        router = Router()
+        dispatch = App(router)
+        router.apps = [dispatch, FakeApp('car', log, ['car']), FakeApp('cars', log, KeywordSet(['cars'], aliases=dict(car='cars')))]
+        self.assertRaises(ValueError, dispatch.start)
+
+    def test_default(self):
+        log = []
+        first = FakeApp('first', log)
+        miles = FakeApp('miles', log, ['miles'])
+        car = FakeApp('car', log, ['car'], defaults=True)
+        last = FakeApp('last', log)
+        dispatch = self.build(first, miles, car, last)
+
+        # nobody handled it, our apps get their default phase in order, until one takes it
+        self.assertEquals([('handle', 'first'), ('handle', 'miles'), ('handle', 'last'),
+                           ('default', 'first'), ('default', 'miles'), ('default', 'car')],
+                          self.handled(dispatch, "miles 120", log))
+
+    def test_exceptions(self):
+        log = []
+        broken = FakeApp('broken', log, fails=True)
+        miles = FakeApp('miles', log, ['miles'], handles=True)
+        dispatch = self.build(broken, miles)
+
+        # a failing app is reported and the next one still gets the message
+        self.assertEquals([('handle', 'broken'), ('handle', 'miles')], self.handled(dispatch, "miles 120", log))
+        self.assertEquals(1, broken.exceptions)
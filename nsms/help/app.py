@@ -1,5 +1,7 @@
 from rapidsms.apps.base import AppBase
+from django.conf import settings
 from nsms.text import gettext as _
+from nsms.spam.duplicates import DuplicateDetector
 import re
 
 _('help', "Unrecognized message, please contact your supervisor for more information")
@@ -8,7 +10,29 @@ class App(AppBase):
     """
     This app is responsible for returning a help message for any message which reaches it.  This makes
     sense for applications which have a shortcode dedicated to them.
+
+    So that we don't keep sending help to someone who keeps sending us junk, help is only sent to
+    each connection once every HELP_REPLY_WINDOW seconds, 600 by default, or every time if it is
+    set to 0.  Set HELP_REPLY_SHARED to remember who we sent help to in our cache, across workers.
+    The number of help messages we didn't send is kept in suppressed and logged.
     """
+    replies = None
+    suppressed = 0
+
+    def get_replies(self):
+        if self.replies is None:
+            self.replies = DuplicateDetector(getattr(settings, 'HELP_REPLY_WINDOW', 600),
+                                             getattr(settings, 'HELP_REPLY_SHARED', False))
+        return self.replies
+
     def handle (self, message):
+        replies = self.get_replies()
+
+        # we already sent help to this connection recently, don't send it again
+        if replies.window and replies.is_duplicate("help_%s" % message.connection.id):
+            self.suppressed += 1
+            self.info("Suppressed help for %s, %d suppressed so far" % (message.connection, self.suppressed))
+            return True
+
         return message.respond(_('help',
                                  "Unrecognized message, please contact your supervisor for more information"))
@@ -0,0 +1,53 @@
+from django.test import TestCase
+from nsms.spam.duplicates import DuplicateDetector
+from .app import App
+import time
+
+class Connection(object):
+    def __init__(self, id):
+        self.id = id
+
+class Message(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.responses = []
+
+    def respond(self, text):
+        self.responses.append(text)
+        return True
+
+class HelpTest(TestCase):
+
+    def send(self, app, connection):
+        message = Message(connection)
+        self.assertTrue(app.handle(message))
+        return len(message.responses)
+
+    def test_throttle(self):
+        app = App(None)
+        app.replies = DuplicateDetector(600)
+
+        first = Connection(1)
+        second = Connection(2)
+
+        # help is only sent once per connection within our window
+        self.assertEquals(1, self.send(app, first))
+        self.assertEquals(0, self.send(app, first))
+        self.assertEquals(0, self.send(app, first))
+        self.assertEquals(1, self.send(app, second))
+        self.assertEquals(2, app.suppressed)
+
+        # once the window is over they get it again
+        app.replies.seen.set("help_1", time.time() - 601)
+        self.assertEquals(1, self.send(app, first))
+        self.assertEquals(0, self.send(app, first))
+        self.assertEquals(3, app.suppressed)
+
+    def test_no_window(self):
+        app = App(None)
+        app.replies = DuplicateDetector(0)
+
+        connection = Connection(1)
+        self.assertEquals(1, self.send(app, connection))
+        self.assertEquals(1, self.send(app, connection))
+        self.assertEquals(0, app.suppressed)
@@ -1,15 +1,19 @@
 from rapidsms.apps.base import AppBase
-from nsms.parser import Parser
+from nsms.parser import Parser, KeywordSet
 from nsms.text import gettext as _
-from nsms.utils import get_sms_profile
+from nsms.utils import get_message_context
+from nsms.text.catalog import CATALOG
 from django.conf import settings
 from django.utils import translation
+from .languages import build_language_index, preload_catalogs, get_language_code, get_language_display
 
 # hackery to make sure our translation database contains all our the strings used in this app
 _('lang-current-lang', "Your language is set to {{ language }}.")
 _('lang-unknown-language', "Sorry, the language code '{{ code }}' is not supported.")
 _('lang-set-success', "Success, your language is now set to {{ language }}.")
 
+KEYWORDS = KeywordSet(['lang'])
+
 class App(AppBase):
     """
     This app is responsible for setting and changing a user's preferred language.
@@ -27,18 +31,24 @@ class App(AppBase):
            lang rw
     """
 
+    def start(self):
+        """
+        Indexes our languages and loads the translations for all of them, so that our messages
+        don't pay for either.
+        """
+        build_language_index()
+        preload_catalogs()
+
+        if CATALOG.texts is None:
+            CATALOG.load()
+
     @classmethod
     def get_language_display(cls, lang):
         """
         Uses our LANGUAGES setting in our config to return a nicer version of
         the language for users.
         """
-        langs = getattr(settings, 'LANGUAGES', ())
-        for (code, display) in langs:
-            if code.lower() == lang.lower():
-                return display
-
-        return lang
+        return get_language_display(lang)
 
 
     def cleanup(self, msg):
@@ -56,22 +66,21 @@ class App(AppBase):
         Also takes care of handing the 'lang' keyword
         """
 
-        profile = get_sms_profile(message.connection)
-
-        # handle activating the appropriate SMS language
+        context = get_message_context(message)
+        profile = context.profile
 
-        # if this connection has a profile, use that language
-        if profile:
-            translation.activate(profile.language)
+        # handle activating the appropriate SMS language, that of the profile for this
+        # connection if there is one, otherwise the default SMS language
+        context.activate_language()
 
-        # otherwise use the default SMS language
-        else:
-            translation.activate(settings.DEFAULT_SMS_LANGUAGE)
+        # not a lang message, no need to parse it
+        if context.keyword != 'lang':
+            return False
 
         parser = Parser(message.text)
 
         # check whether this is a lang message
-        keyword = parser.next_keyword(['lang'])
+        keyword = parser.next_keyword(KEYWORDS)
         if keyword:
             if not profile:
                 message.respond(_('lang-unknown-user', "Sorry, your phone number is not registered."))
@@ -87,27 +96,20 @@ class App(AppBase):
             else:
                 # lowercase the language they passed us
                 language = language.lower()
-
-                lang_mapping = dict()
-                for lang in settings.LANGUAGES:
-                    code = lang[0].lower()
-                    lang_mapping[code] = code
-
-                    parts = code.split('_')
-                    if not parts[0] in lang_mapping:
-                        lang_mapping[parts[0]] = code
+                code = get_language_code(language)
 
                 # this language doesn't exit
-                if not language.lower() in lang_mapping:
+                if not code:
                     message.respond(_('lang-unknown-language', "Sorry, the language code '{{ code }}' is not supported.",
-                                      dict(code=language.lower())))
+                                      dict(code=language)))
                     return True
 
-                profile.language = lang_mapping[language.lower()]
+                profile.language = code
                 profile.save()
+                context.set('language', profile.language)
                 
                 # activate the new language
-                translation.activate(profile.language)
+                context.activate_language()
                 message.respond(_('lang-set-success', "Success, your language is now set to {{ language }}.",
                                   dict(language=App.get_language_display(profile.language))))
 
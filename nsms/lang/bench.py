@@ -0,0 +1,127 @@
+"""
+Benchmarks for the per message cost of our lang app.  Run them with:
+
+       python -m nsms.lang.bench [--messages 10000] [--seed 0] [--repeat 3]
+
+We time the language work done for each message as it goes through our lang app and an app
+after it, like mileage: both apps activating the sender's language, resolving and displaying
+the language of 'lang' messages and activating the default language again on cleanup.  This is
+done both the way the apps used to, rebuilding the mapping, scanning LANGUAGES and activating
+every time, and using our precomputed index and skipping activations already done for the
+message.
+Results are reported as JSON in messages per second.  Outside of a project we configure Django
+with the languages of our skeleton project.
+"""
+import sys
+import json
+import random
+import timeit
+from optparse import OptionParser
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(USE_I18N=True,
+                       LANGUAGES=(('en_us', "English"), ('rw', "Kinyarwanda"), ('fr', "French")),
+                       DEFAULT_LANGUAGE="en_us",
+                       DEFAULT_SMS_LANGUAGE="rw")
+
+    # newer versions of Django need their apps set up before translating
+    if hasattr(django, 'setup'):
+        django.setup()
+
+from django.utils import translation
+from .languages import build_language_index, preload_catalogs, get_language_code, get_language_display, activate
+
+def legacy_message(language, requested):
+    # our lang app
+    translation.activate(language)
+
+    if requested:
+        lang_mapping = dict()
+        for lang in settings.LANGUAGES:
+            code = lang[0].lower()
+            lang_mapping[code] = code
+
+            parts = code.split('_')
+            if not parts[0] in lang_mapping:
+                lang_mapping[parts[0]] = code
+
+        code = lang_mapping.get(requested)
+        if code:
+            for (other, display) in settings.LANGUAGES:
+                if other.lower() == code:
+                    break
+
+    # the app after it
+    translation.activate(language)
+
+    # cleanup
+    translation.activate(settings.DEFAULT_LANGUAGE)
+
+def indexed_message(language, requested):
+    # the values of the MessageContext for this message
+    state = dict()
+
+    # our lang app
+    activate(language, state)
+
+    if requested:
+        code = get_language_code(requested)
+        if code:
+            get_language_display(code)
+
+    # the app after it
+    activate(language, state)
+
+    # cleanup
+    translation.activate(settings.DEFAULT_LANGUAGE)
+
+def generate_messages(count, seed=0):
+    """
+    Returns count (sender language, requested language) tuples, most senders using our default
+    SMS language and one message in ten being a 'lang' message
+    """
+    rnd = random.Random(seed)
+    codes = [code for (code, display) in settings.LANGUAGES]
+    requests = codes + [code.split('_')[0] for code in codes] + ['xx']
+
+    messages = []
+    for i in range(count):
+        language = settings.DEFAULT_SMS_LANGUAGE if rnd.random() < 0.8 else rnd.choice(codes)
+        requested = rnd.choice(requests) if rnd.random() < 0.1 else None
+        messages.append((language, requested))
+
+    return messages
+
+def measure(handle, messages, repeat):
+    timings = []
+    for i in range(repeat):
+        start = timeit.default_timer()
+        for (language, requested) in messages:
+            handle(language, requested)
+        timings.append(timeit.default_timer() - start)
+
+    return int(len(messages) / min(timings))
+
+def benchmark(count=10000, seed=0, repeat=3):
+    build_language_index()
+    preload_catalogs()
+
+    messages = generate_messages(count, seed)
+    return dict(messages=count,
+                legacy_per_sec=measure(legacy_message, messages, repeat),
+                indexed_per_sec=measure(indexed_message, messages, repeat))
+
+def main(args=None):
+    parser = OptionParser(usage="python -m nsms.lang.bench [options]")
+    parser.add_option('--messages', type='int', default=10000, help="number of messages to time")
+    parser.add_option('--seed', type='int', default=0, help="seed for our messages")
+    parser.add_option('--repeat', type='int', default=3, help="timing runs per benchmark, we keep the best")
+    (options, args) = parser.parse_args(args)
+
+    results = benchmark(options.messages, options.seed, options.repeat)
+    sys.stdout.write(json.dumps(results, sort_keys=True, indent=2) + "\n")
+
+if __name__ == '__main__':
+    main()
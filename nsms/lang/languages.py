@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.utils import translation
+
+# our LANGUAGES, indexed once by build_language_index(), codes and their prefixes mapping to
+# the code they stand for (ie: en -> en_us) and codes mapping to their display names
+LANGUAGE_MAPPING = None
+LANGUAGE_DISPLAYS = None
+
+def build_language_index():
+    """
+    Builds our index of LANGUAGES, the first language with a given prefix gets that prefix
+    """
+    global LANGUAGE_MAPPING, LANGUAGE_DISPLAYS
+
+    mapping = dict()
+    displays = dict()
+    for (code, display) in getattr(settings, 'LANGUAGES', ()):
+        code = code.lower()
+        mapping[code] = code
+
+        prefix = code.split('_')[0]
+        if not prefix in mapping:
+            mapping[prefix] = code
+
+        if not code in displays:
+            displays[code] = display
+
+    LANGUAGE_MAPPING = mapping
+    LANGUAGE_DISPLAYS = displays
+
+def get_language_code(language):
+    """
+    Returns the configured language code the passed in language or prefix stands for, or None
+    """
+    if LANGUAGE_MAPPING is None:
+        build_language_index()
+
+    return LANGUAGE_MAPPING.get(language.lower())
+
+def get_language_display(language):
+    """
+    Returns the display name of the passed in language code, or the code itself if it isn't one of ours
+    """
+    if LANGUAGE_DISPLAYS is None:
+        build_language_index()
+
+    return LANGUAGE_DISPLAYS.get(language.lower(), language)
+
+def activate(language, state):
+    """
+    Activates the passed in language, unless it is the one we already activated while handling
+    the current message, state being the dict we remember that in, ie: the values of the
+    MessageContext of the message.
+    """
+    if state.get('activated') == language:
+        return
+
+    translation.activate(language)
+    state['activated'] = language
+
+def preload_catalogs():
+    """
+    Loads the Django translation catalogs for all our LANGUAGES so that no message pays for
+    loading one, leaving the default language active.
+    """
+    for (code, display) in getattr(settings, 'LANGUAGES', ()):
+        translation.activate(code)
+
+    translation.activate(getattr(settings, 'DEFAULT_LANGUAGE', 'en_us'))
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+class LRUCache(object):
+    """
+    A bounded in-process cache which evicts the least recently used item once it holds more
+    than max_size items.  Keeps count of hits and misses so we can see how useful it is.
+    """
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.items:
+            # move this item to the end, it is now our most recently used
+            value = self.items.pop(key)
+            self.items[key] = value
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        if key in self.items:
+            del self.items[key]
+        elif len(self.items) >= self.max_size:
+            self.items.popitem(last=False)
+
+        self.items[key] = value
+
+    def delete(self, key):
+        self.items.pop(key, None)
+
+    def clear(self):
+        self.items.clear()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
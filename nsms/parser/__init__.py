@@ -1 +1,3 @@
 from .parser import *
+from .grammar import *
+from .batch import *
@@ -0,0 +1,99 @@
+import itertools
+from collections import deque, namedtuple
+from .grammar import Grammar, Grammars, UNRECOGNIZED
+
+# the result for each text in a batch, code and error are None when the text matched
+BatchResult = namedtuple('BatchResult', ['text', 'record', 'code', 'error'])
+
+# the grammar used by worker processes, built once per worker
+WORKER_GRAMMAR = None
+
+def get_grammar_spec(grammar):
+    """
+    Returns what we need to build the passed in grammar or set of grammars again in a worker
+    process, we only need to match there so errors are left out.
+    """
+    if isinstance(grammar, Grammars):
+        formats = [(curr.format, curr.delimiters, curr.fuzzy) for curr in grammar.grammars.values()]
+        return (formats, grammar.keywords.fuzzy)
+
+    return ([(grammar.format, grammar.delimiters, grammar.fuzzy)], None)
+
+def build_grammar(formats, fuzzy):
+    grammars = [Grammar(format, delimiters=delimiters, fuzzy=curr_fuzzy) for (format, delimiters, curr_fuzzy) in formats]
+
+    if fuzzy is None:
+        return grammars[0]
+
+    return Grammars(*grammars, fuzzy=fuzzy)
+
+def init_worker(formats, fuzzy):
+    global WORKER_GRAMMAR
+    WORKER_GRAMMAR = build_grammar(formats, fuzzy)
+
+def match_chunk(texts):
+    """
+    Matches a chunk of texts in a worker process, returning (keyword, values, code) for each
+    """
+    results = []
+    for text in texts:
+        (grammar, values, code) = WORKER_GRAMMAR.try_match(text)
+        results.append((grammar.keyword if grammar else None, values, code))
+
+    return results
+
+def build_result(grammars, text, keyword, values, code):
+    if code == UNRECOGNIZED:
+        return BatchResult(text, None, code, None)
+
+    grammar = grammars[keyword]
+    if code:
+        return BatchResult(text, None, code, grammar.get_error(code))
+
+    return BatchResult(text, grammar.record(*values), None, None)
+
+def parse_batch(grammar, texts, processes=None, chunk_size=1000):
+    """
+    Matches every text in the passed in iterable against a Grammar or set of Grammars, yielding
+    a BatchResult for each in the same order.  Nothing is raised for texts that don't match,
+    instead their result has the error code (see Grammar.try_match) and the configured error.
+
+    Texts are read lazily, so this can be used to replay millions of messages.  When processes
+    is more than one, chunks of chunk_size texts are matched in a pool of that many worker
+    processes, with only a few chunks in flight at any time.
+    """
+    if isinstance(grammar, Grammars):
+        grammars = grammar.grammars
+    else:
+        grammars = {grammar.keyword: grammar}
+
+    if not processes or processes <= 1:
+        for text in texts:
+            (matched, values, code) = grammar.try_match(text)
+            yield build_result(grammars, text, matched.keyword if matched else None, values, code)
+        return
+
+    import multiprocessing
+    pool = multiprocessing.Pool(processes, init_worker, get_grammar_spec(grammar))
+
+    try:
+        texts = iter(texts)
+        pending = deque()
+
+        while True:
+            # keep each worker busy with a couple chunks at most
+            while len(pending) < processes * 2:
+                chunk = list(itertools.islice(texts, chunk_size))
+                if not chunk:
+                    break
+                pending.append((chunk, pool.apply_async(match_chunk, (chunk,))))
+
+            if not pending:
+                break
+
+            (chunk, results) = pending.popleft()
+            for (text, (keyword, values, code)) in zip(chunk, results.get()):
+                yield build_result(grammars, text, keyword, values, code)
+
+    finally:
+        pool.terminate()
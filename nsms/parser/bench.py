@@ -0,0 +1,226 @@
+"""
+Benchmarks for our Parser.  Run them with:
+
+       python -m nsms.parser.bench [--messages 2000] [--seed 0] [--repeat 3]
+
+Every Parser method is run over a synthetic corpus of messages (see corpus.py), and we
+report the operations per second and the peak memory allocated per operation as JSON, with the
+same keys in the same order every time so runs can be diffed and compared by scripts.
+Allocations are measured with tracemalloc, on Pythons without it (2.7) peak_bytes_per_op is
+null and the allocations key of the results says so.
+
+We also parse the messages from our tests and some long messages to exhaustion using our
+tokenizing Parser and the original slicing implementation, to keep an eye on that gain.
+"""
+import sys
+import json
+import timeit
+import platform
+from optparse import OptionParser
+from .parser import Parser, KeywordSet
+from .corpus import generate_corpus, KEYWORDS
+from .dates import DATES
+
+try:
+    import tracemalloc
+except ImportError: # pragma: no cover
+    tracemalloc = None
+
+# the messages used in nsms/parser/tests.py, with their delimiters
+CASES = (
+    ("REG James Kirk 10.12.44 0788383381", ()),
+    ("REG, James, Kirk, 10.12.44, 0788383381", (',',)),
+    ("REG. James. Kirk. 10/12/44. 0788383381", ('.',)),
+    ("REG.James.Kirk.10/12/44.0788383381", ('.', ' ', ',')),
+    ("REG James,.Kirk, . 10/12/44,0788383381", ('.', ' ', ',')),
+    ("  120 Homeless children", ()),
+    (" hello, world.foo", (',',)),
+    ("reg, bach", (' ', ',', '.')),
+)
+
+# a long message, the kind of thing that used to cost us quadratic copying
+LONG_CASES = (
+    (" ".join(["word%d" % i for i in range(150)]), ()),
+    (", ".join(["word%d" % i for i in range(150)]), (',', ' ')),
+)
+
+class SlicingParser(object):
+    """
+    The original word handling of our Parser, which slices and strips the remainder of
+    the message for every word.  Only used as a baseline.
+    """
+    def __init__(self, msg, *args):
+        self.delimiter = ' '
+        if args:
+            self.delimiter = args[0]
+            for arg in args[1:]:
+                msg = msg.replace(arg, self.delimiter)
+
+        self.rest = msg.strip(self.delimiter).strip()
+
+    def get_word_count(self):
+        if len(self.rest) > 0:
+            return len(self.rest.split(self.delimiter))
+        return 0
+
+    word_count = property(get_word_count)
+
+    def has_word(self):
+        return self.word_count > 0
+
+    def next_word(self):
+        next_delimiter = self.rest.find(self.delimiter)
+        word = None
+
+        if next_delimiter > 0:
+            word = self.rest[:next_delimiter]
+            self.rest = self.rest[next_delimiter:].strip(self.delimiter).strip()
+        elif self.rest:
+            word = self.rest
+            self.rest = ""
+
+        return word
+
+def consume(parser_class, cases):
+    """
+    Parses every case to exhaustion, checking whether there is a word left before each word.
+    """
+    for (msg, args) in cases:
+        parser = parser_class(msg, *args)
+        while parser.has_word():
+            parser.next_word()
+
+def compare(cases, number):
+    """
+    Returns the number of messages per second parsed by the slicing and tokenizing parsers.
+    """
+    results = []
+    for parser_class in (SlicingParser, Parser):
+        seconds = min(timeit.repeat(lambda: consume(parser_class, cases), number=number, repeat=3))
+        results.append(len(cases) * number / seconds)
+
+    return results
+
+KEYWORD_SET = KeywordSet(KEYWORDS)
+FUZZY_KEYWORD_SET = KeywordSet(KEYWORDS, fuzzy=True)
+
+# the operations we benchmark, each is called with a fresh parser for every message
+METHODS = (
+    ('next_word', lambda parser: parser.next_word()),
+    ('peek_word', lambda parser: parser.peek_word()),
+    ('has_word', lambda parser: parser.has_word()),
+    ('word_count', lambda parser: parser.word_count),
+    ('rest', lambda parser: parser.rest),
+    ('insert_word', lambda parser: parser.insert_word("reg")),
+    ('next_keyword', lambda parser: parser.next_keyword(KEYWORDS)),
+    ('next_keyword_set', lambda parser: parser.next_keyword(KEYWORD_SET)),
+    ('next_keyword_fuzzy', lambda parser: parser.next_keyword(FUZZY_KEYWORD_SET)),
+    ('next_int', lambda parser: (parser.next_word(), parser.next_int())),
+    ('next_phone', lambda parser: (parser.next_word(), parser.next_phone())),
+    ('next_phone_e164', lambda parser: (parser.next_word(), parser.next_phone(country_code="250"))),
+    ('next_date', lambda parser: (parser.next_word(), parser.next_date())),
+    ('next_hour', lambda parser: (parser.next_word(), parser.next_hour())),
+    ('parse_all', lambda parser: [parser.next_word() for i in range(parser.word_count)]),
+)
+
+def call(method, parser):
+    try:
+        method(parser)
+    except Exception:
+        pass
+
+def measure(method, corpus, repeat):
+    """
+    Returns the operations per second for the passed in method and, where tracemalloc is
+    available, the peak memory it allocated per operation.  Failed operations are counted too.
+
+    Our date parser memoizes the words it has seen, we start every run with an empty memo so
+    that we time our date parsing and not the lookups of the previous run's results.
+    """
+    timings = []
+    for i in range(repeat):
+        parsers = [Parser(text, *delimiters) for (kind, text, delimiters) in corpus]
+        DATES.cache.clear()
+
+        start = timeit.default_timer()
+        for parser in parsers:
+            call(method, parser)
+        timings.append(timeit.default_timer() - start)
+
+    result = dict(ops_per_sec=int(len(corpus) / min(timings)))
+
+    if tracemalloc:
+        parsers = [Parser(text, *delimiters) for (kind, text, delimiters) in corpus]
+        DATES.cache.clear()
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for parser in parsers:
+            call(method, parser)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result['peak_bytes_per_op'] = int((peak - before) / len(corpus))
+    else:
+        result['peak_bytes_per_op'] = None
+
+    return result
+
+def measure_init(corpus, repeat):
+    """
+    Returns the operations per second and bytes allocated for constructing parsers
+    """
+    timings = []
+    for i in range(repeat):
+        start = timeit.default_timer()
+        for (kind, text, delimiters) in corpus:
+            Parser(text, *delimiters)
+        timings.append(timeit.default_timer() - start)
+
+    result = dict(ops_per_sec=int(len(corpus) / min(timings)))
+
+    if tracemalloc:
+        tracemalloc.start()
+        parsers = [Parser(text, *delimiters) for (kind, text, delimiters) in corpus]
+        result['peak_bytes_per_op'] = int(tracemalloc.get_traced_memory()[0] / len(corpus))
+        tracemalloc.stop()
+    else:
+        result['peak_bytes_per_op'] = None
+
+    return result
+
+def benchmark(messages=2000, seed=0, repeat=3):
+    """
+    Runs all our benchmarks, returning the results as a dict
+    """
+    corpus = generate_corpus(messages, seed)
+
+    methods = dict(init=measure_init(corpus, repeat))
+    for (name, method) in METHODS:
+        methods[name] = measure(method, corpus, repeat)
+
+    comparison = dict()
+    for (name, cases, number) in (('test_cases', CASES, 2000), ('long_messages', LONG_CASES, 100)):
+        (slicing, tokenized) = compare(cases, number)
+        comparison[name] = dict(slicing_msgs_per_sec=int(slicing), tokenized_msgs_per_sec=int(tokenized))
+
+    if tracemalloc:
+        allocations = "measured with tracemalloc"
+    else:
+        allocations = "not measured, tracemalloc needs Python 3.4 or later"
+
+    return dict(python=platform.python_version(), messages=messages, seed=seed, allocations=allocations,
+                methods=methods, slicing_comparison=comparison)
+
+def main(args=None):
+    parser = OptionParser(usage="python -m nsms.parser.bench [options]")
+    parser.add_option('--messages', type='int', default=2000, help="number of synthetic messages to generate")
+    parser.add_option('--seed', type='int', default=0, help="seed for our synthetic messages")
+    parser.add_option('--repeat', type='int', default=3, help="timing runs per benchmark, we keep the best")
+    (options, args) = parser.parse_args(args)
+
+    results = benchmark(options.messages, options.seed, options.repeat)
+    sys.stdout.write(json.dumps(results, sort_keys=True, indent=2) + "\n")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import random
+
+KEYWORDS = ('reg', 'register', 'miles', 'car', 'lang', 'report', 'stock', 'visit')
+NAMES = ('James', 'Kirk', 'Uhura', 'Spock', 'Sulu', 'Chekov', 'Scott', 'McCoy', 'Rand', 'Chapel')
+WORDS = ('the', 'clinic', 'has', 'no', 'more', 'stock', 'of', 'malaria', 'tests', 'please', 'send',
+         'some', 'before', 'friday', 'children', 'seen', 'today', 'road', 'closed', 'after', 'rain')
+
+# delimiter sets the way apps pass them to the parser
+DELIMITERS = ((), (',',), ('.',), (' ', ',', '.'), ('.', ' ', ','), (',', ' '))
+
+def typo(rnd, word):
+    """
+    Returns the passed in word with one swapped, missing, extra or wrong letter
+    """
+    if len(word) < 3:
+        return word
+
+    index = rnd.randrange(len(word) - 1)
+    kind = rnd.randrange(4)
+
+    if kind == 0:
+        return word[:index] + word[index+1] + word[index] + word[index+2:]
+    elif kind == 1:
+        return word[:index] + word[index+1:]
+    elif kind == 2:
+        return word[:index] + rnd.choice('abcdefghijklmnopqrstuvwxyz') + word[index:]
+    else:
+        return word[:index] + rnd.choice('abcdefghijklmnopqrstuvwxyz') + word[index+1:]
+
+def confuse(rnd, digits):
+    """
+    Swaps some digits for the letters feature phone users confuse them with
+    """
+    return "".join(['l' if c == '1' and rnd.random() < 0.2 else
+                    rnd.choice('oO') if c == '0' and rnd.random() < 0.2 else c for c in digits])
+
+def random_date(rnd):
+    separator = rnd.choice('./-')
+    year = rnd.choice(("%02d" % rnd.randrange(100), "%d" % rnd.randrange(1940, 2030)))
+    return separator.join(("%d" % rnd.randrange(1, 32), "%d" % rnd.randrange(1, 13), year))
+
+def random_phone(rnd):
+    number = "78%08d" % rnd.randrange(10 ** 8)
+    return rnd.choice(("0" + number, "250" + number, "+250" + number, confuse(rnd, "0" + number)))
+
+def join(rnd, words, delimiters):
+    """
+    Joins words using the passed in delimiters, mixing them up and adding stray spaces
+    """
+    separators = delimiters or (' ',)
+    text = words[0]
+    for word in words[1:]:
+        separator = rnd.choice(separators)
+        if separator != ' ' and rnd.random() < 0.5:
+            separator += ' '
+        text += separator + word
+
+    if rnd.random() < 0.2:
+        text = "  " + text + rnd.choice(separators)
+
+    return text
+
+def generate_message(rnd):
+    """
+    Returns a synthetic SMS as a tuple of (kind, text, delimiters)
+    """
+    delimiters = rnd.choice(DELIMITERS)
+    kind = rnd.choice(('keyword', 'typo', 'registration', 'report', 'multipart'))
+    keyword = rnd.choice(KEYWORDS)
+
+    if kind == 'keyword':
+        words = [keyword.upper() if rnd.random() < 0.3 else keyword, confuse(rnd, "%d" % rnd.randrange(100000))]
+
+    elif kind == 'typo':
+        words = [typo(rnd, keyword), rnd.choice(NAMES)]
+
+    elif kind == 'registration':
+        words = [keyword, rnd.choice(NAMES), rnd.choice(NAMES), random_date(rnd), random_phone(rnd)]
+
+    elif kind == 'report':
+        words = [keyword, "%02d%02d" % (rnd.randrange(24), rnd.randrange(60)), random_date(rnd),
+                 "%d" % rnd.randrange(1000)]
+
+    # concatenated messages, several SMS worth of free text
+    else:
+        words = [keyword] + [rnd.choice(WORDS) for i in range(rnd.randrange(40, 120))]
+
+    return (kind, join(rnd, words, delimiters), delimiters)
+
+def generate_corpus(count, seed=0):
+    """
+    Returns a list of count synthetic messages, the same ones for the same seed
+    """
+    rnd = random.Random(seed)
+    return [generate_message(rnd) for i in range(count)]
@@ -0,0 +1,173 @@
+import re
+import time
+import datetime
+from .normalize import fix_digits
+
+# dd[separator]mm[separator]yy anywhere in the word
+FULL_DATE_REGEX = re.compile(r'(\d+)[\.|\/|-](\d+)[\.|\/|-](\d+)')
+
+# dd[separator]mm, the year being the current one
+DAY_MONTH_REGEX = re.compile(r'^(\d{1,2})[\./-](\d{1,2})$')
+
+# ddmmyy or ddmmyyyy
+COMPACT_DATE_REGEX = re.compile(r'^(\d{2})(\d{2})(\d{2}|\d{4})$')
+
+# 13h30, 13:30 or 13h
+HOUR_MINUTE_REGEX = re.compile(r'^(\d{1,2})[hH:](\d{2})?$')
+
+# day names map to the most recent day with that name, today included
+DAY_NAMES = dict()
+for (weekday, names) in enumerate((('monday', 'mon', 'lundi', 'lun'),
+                                   ('tuesday', 'tue', 'tues', 'mardi', 'mar'),
+                                   ('wednesday', 'wed', 'mercredi', 'mer'),
+                                   ('thursday', 'thu', 'thur', 'thurs', 'jeudi', 'jeu'),
+                                   ('friday', 'fri', 'vendredi', 'ven'),
+                                   ('saturday', 'sat', 'samedi', 'sam'),
+                                   ('sunday', 'sun', 'dimanche', 'dim'))):
+    for name in names:
+        DAY_NAMES[name] = weekday
+
+class DateParser(object):
+    """
+    Parses dates and hours out of words.  Everything that depends on the current date, like
+    which century two digit years belong to, is computed once per day, and results are
+    memoized per word since the same dates get sent over and over by reporting campaigns.
+    The memo is cleared every day and whenever it grows past max_cache entries.
+    """
+    def __init__(self, get_today=datetime.date.today, max_cache=10000):
+        self.get_today = get_today
+        self.max_cache = max_cache
+        self.expires = 0
+        self.cache = dict()
+
+    def refresh(self):
+        """
+        Recomputes our notion of today if the day has changed since we last did
+        """
+        now = time.time()
+        if now < self.expires:
+            return
+
+        self.today = self.get_today()
+
+        # our first assumption is that two digit years are in the 2000s.. but if that makes the
+        # year greater than today + 5 (arbitrary but seems sane) then we downgrade it to 1900s
+        self.pivot = self.today.year + 5
+
+        # we'll check again at midnight
+        tomorrow = datetime.date.fromtimestamp(now) + datetime.timedelta(days=1)
+        tomorrow = datetime.datetime.combine(tomorrow, datetime.time())
+        self.expires = time.mktime(tomorrow.timetuple())
+        self.cache.clear()
+
+    def memoize(self, kind, word, parse):
+        self.refresh()
+
+        key = (kind, word)
+        if key in self.cache:
+            return self.cache[key]
+
+        value = parse(word)
+
+        if len(self.cache) >= self.max_cache:
+            self.cache.clear()
+        self.cache[key] = value
+
+        return value
+
+    def parse_date(self, word):
+        """
+        Returns the date in the passed in word, or None if it isn't a valid date.  We support
+        dd.mm.yy (with '.', '/' or '-' as separators and two or four digit years), dd.mm for
+        the current year, ddmmyy, ddmmyyyy and day names for the most recent such day.
+        """
+        if not word:
+            return None
+
+        return self.memoize('date', word, self._parse_date)
+
+    def _parse_date(self, word):
+        match = FULL_DATE_REGEX.search(word)
+        if match:
+            return self.build_date(*match.groups())
+
+        match = COMPACT_DATE_REGEX.match(word)
+        if match:
+            return self.build_date(*match.groups())
+
+        match = DAY_MONTH_REGEX.match(word)
+        if match:
+            return self.build_date(match.group(1), match.group(2), self.today.year)
+
+        weekday = DAY_NAMES.get(word.lower())
+        if weekday is not None:
+            return self.today - datetime.timedelta(days=(self.today.weekday() - weekday) % 7)
+
+        return None
+
+    def build_date(self, day, month, year):
+        try:
+            # now that we expect day month and year to be integer values there is a probability
+            day = int(day)
+            month = int(month)
+            year = int(year)
+
+            # two digit date, figure out whether it is in the 1900s or 2000s
+            if year < 100:
+                year = year + 2000
+                if year > self.pivot:
+                    year = year - 100
+
+            # year has to be more than 1000 in our world
+            if year > 1000:
+                return datetime.date(day=day, month=month, year=year)
+
+        except:
+            pass
+
+        return None
+
+    def parse_hour(self, word):
+        """
+        Returns the hour (0-23) in the passed in word, or None if it isn't a valid hour.  We
+        support hh, hhmm, hh:mm and hhHmm (13h30), we only care about the hour.
+        """
+        if not word:
+            return None
+
+        return self.memoize('hour', word, self._parse_hour)
+
+    def _parse_hour(self, word):
+        # considering the context of a feature phone it is easy to confuse
+        # 'l' to 1 and 'o' to 0, lets handle this situation
+        hour = fix_digits(word)
+
+        # hour and minutes with a separator (13h30), we care only about hour
+        match = HOUR_MINUTE_REGEX.match(hour)
+        if match:
+            hour = match.group(1)
+
+        # four digits means this is hour and minute (1312 for 13), we care only about hour
+        elif len(hour) == 4:
+            hour = hour[:2]
+
+        # hours need to be integers
+        try:
+            hour_int = int(hour)
+        except:
+            return None
+
+        # hours should be in 24 hour format, ie, 00-23
+        if hour_int < 0 or hour_int > 23:
+            return None
+
+        return hour_int
+
+# our shared date parser
+DATES = DateParser()
+
+def parse_date(word):
+    return DATES.parse_date(word)
+
+def parse_hour(word):
+    return DATES.parse_hour(word)
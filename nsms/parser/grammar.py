@@ -0,0 +1,220 @@
+import re
+from collections import namedtuple
+from .parser import Parser, ParseException, KeywordSet, clean_int, clean_phone, clean_date, clean_hour
+
+# matches a field in our format, ie: <int:miles> or <word(8):license_plate>
+FIELD_REGEX = re.compile(r'^<(\w+)(?:\((\d+)\))?:(\w+)>$')
+
+def clean_typed_int(word):
+    integer = clean_int(word)
+    if integer is not None:
+        return int(integer)
+
+# error codes for messages that don't match, invalid fields use the field name as their code
+UNRECOGNIZED = 'unrecognized'
+FORMAT = 'format'
+
+# our field types, mapped to the functions which convert words to values, returning None when invalid
+FIELD_TYPES = {
+    'word': lambda word: word,
+    'int': clean_typed_int,
+    'phone': clean_phone,
+    'date': clean_date,
+    'hour': clean_hour,
+}
+
+class Grammar(object):
+    """
+    A message format declared once and compiled to a matcher, for example:
+
+           Grammar('miles|m <int:miles>', error=_('bad-miles-format', "..."))
+           Grammar('car|c <word(8):license_plate>', error=bad_format, errors=dict(license_plate=bad_plate))
+
+    The first element is the keyword for the message, with any aliases separated by '|'.  Fields
+    are declared as <type:name> where type is one of word, int, phone, date or hour.  Words can
+    be given an exact length, ie: <word(8):name>, and the last field can be <text:name>, which
+    takes everything left in the message.  Setting fuzzy lets our keyword be matched with a typo,
+    see KeywordSet.
+
+    Matching a message returns a record with the canonical keyword and a typed value for every
+    field, or None if the message doesn't start with our keyword.  If the keyword matches but a
+    field is missing we raise a ParseException with our error, if a field is invalid we raise
+    one with the error for that field, falling back to our error.
+    """
+    def __init__(self, format, error=None, errors=None, delimiters=None, fuzzy=False):
+        self.format = format
+        self.error = error
+        self.errors = errors or dict()
+        self.delimiters = tuple(delimiters or ())
+        self.fuzzy = fuzzy
+
+        elements = format.split()
+        if not elements or elements[0].startswith('<'):
+            raise ValueError("Message format '%s' must start with a keyword" % format)
+
+        aliases = elements[0].lower().split('|')
+        self.keyword = aliases[0]
+        self.keywords = KeywordSet(aliases[:1], dict((alias, self.keyword) for alias in aliases[1:]), fuzzy=fuzzy)
+
+        # each step is a tuple of (kind, name, argument)
+        names = ['keyword']
+        self.steps = []
+        for (index, element) in enumerate(elements[1:]):
+            match = FIELD_REGEX.match(element)
+
+            # not a field, this is a literal word that must be present
+            if not match:
+                self.steps.append(('literal', None, KeywordSet(element.split('|'))))
+                continue
+
+            (field_type, length, name) = match.groups()
+            if name in names:
+                raise ValueError("Duplicate field '%s' in message format '%s'" % (name, format))
+            names.append(name)
+
+            if field_type == 'text':
+                if index != len(elements) - 2:
+                    raise ValueError("Text field '%s' must be last in message format '%s'" % (name, format))
+                self.steps.append(('text', name, None))
+
+            elif field_type in FIELD_TYPES:
+                self.steps.append(('field', name, (FIELD_TYPES[field_type], int(length) if length else None)))
+
+            else:
+                raise ValueError("Unknown field type '%s' in message format '%s'" % (field_type, format))
+
+        self.record = namedtuple('Record', names)
+
+    def get_error(self, code):
+        """
+        Returns the error for the passed in error code, either FORMAT or the name of a field
+        """
+        if code == FORMAT:
+            return self.error
+
+        return self.errors.get(code, self.error)
+
+    def match(self, text):
+        """
+        Matches the passed in text against our format, returning None if it doesn't start with
+        one of our keywords
+        """
+        (grammar, values, code) = self.try_match(text)
+
+        if code == UNRECOGNIZED:
+            return None
+        elif code:
+            raise ParseException(self.get_error(code))
+
+        return self.record(*values)
+
+    def try_match(self, text):
+        """
+        Matches the passed in text without raising, returns a tuple of (grammar, values, code)
+        where code is None if the text matched, UNRECOGNIZED if it doesn't start with our
+        keyword, FORMAT if words are missing or the name of the first invalid field.
+        """
+        parser = Parser(text, *self.delimiters)
+        keyword = parser.next_word()
+
+        if not keyword or not self.keywords.get(keyword):
+            return (None, None, UNRECOGNIZED)
+
+        (values, code) = self.read(parser)
+        return (self, values, code)
+
+    def parse(self, parser):
+        """
+        Reads the fields following our keyword from the passed in parser
+        """
+        (values, code) = self.read(parser)
+
+        if code:
+            raise ParseException(self.get_error(code))
+
+        return self.record(*values)
+
+    def read(self, parser):
+        """
+        Reads the values following our keyword from the passed in parser without raising,
+        returning a tuple of (values, code) where code is None if all fields were valid.
+        """
+        values = [self.keyword]
+
+        for (kind, name, argument) in self.steps:
+            # text fields are the rest of the message
+            if kind == 'text':
+                values.append(parser.rest)
+                parser.rest = ""
+                continue
+
+            word = parser.next_word()
+            if not word:
+                return (values, FORMAT)
+
+            if kind == 'literal':
+                if not word in argument:
+                    return (values, FORMAT)
+                continue
+
+            (convert, length) = argument
+            value = convert(word)
+            if value is None or (length is not None and len(word) != length):
+                return (values, name)
+
+            values.append(value)
+
+        return (values, None)
+
+class Grammars(object):
+    """
+    A set of grammars indexed by keyword.  Matching a message reads its first word once and
+    goes straight to the grammar for that keyword instead of trying each grammar in turn.
+    Passing fuzzy=True lets keywords be matched with a typo across the whole set.
+    """
+    def __init__(self, *grammars, **kwargs):
+        self.grammars = dict()
+        self.delimiters = grammars[0].delimiters if grammars else ()
+
+        aliases = dict()
+        for grammar in grammars:
+            if grammar.delimiters != self.delimiters:
+                raise ValueError("All grammars in a set must use the same delimiters")
+
+            for word in grammar.keywords:
+                if word in aliases:
+                    raise ValueError("Keyword '%s' is used by more than one grammar" % word)
+                aliases[word] = grammar.keyword
+
+            self.grammars[grammar.keyword] = grammar
+
+        self.keywords = KeywordSet(self.grammars.keys(), aliases, fuzzy=kwargs.get('fuzzy', False))
+
+    def match(self, text):
+        """
+        Returns the record for the grammar matching the passed in text, or None if no grammar
+        uses its keyword
+        """
+        (grammar, values, code) = self.try_match(text)
+
+        if code == UNRECOGNIZED:
+            return None
+        elif code:
+            raise ParseException(grammar.get_error(code))
+
+        return grammar.record(*values)
+
+    def try_match(self, text):
+        """
+        Matches the passed in text without raising, see Grammar.try_match
+        """
+        parser = Parser(text, *self.delimiters)
+        word = parser.next_word()
+
+        keyword = self.keywords.get(word) if word else None
+        if not keyword:
+            return (None, None, UNRECOGNIZED)
+
+        grammar = self.grammars[keyword]
+        (values, code) = grammar.read(parser)
+        return (grammar, values, code)
@@ -0,0 +1,41 @@
+# the extra delimiters we actually need to replace, keyed by the tuple of delimiters passed to the parser
+REPLACEMENTS = dict()
+
+def fix_digits(word):
+    """
+    Returns the passed in word with letters that are commonly confused with digits on feature
+    phones replaced, 'l' with 1 and 'o' or 'O' with 0
+    """
+    if word:
+        return word.replace('l', '1').replace('o', '0').replace('O', '0')
+    return word
+
+def get_replacements(delimiters):
+    """
+    Returns the extra delimiters that need replacing by the first one.  Delimiters that are the
+    same as the first one are left out, as are repeats unless they are part of the first one,
+    in which case replacing them again changes the message.
+    """
+    if delimiters in REPLACEMENTS:
+        return REPLACEMENTS[delimiters]
+
+    delimiter = delimiters[0]
+    replacements = []
+    for extra in delimiters[1:]:
+        if extra == delimiter or (extra in replacements and not extra in delimiter):
+            continue
+        replacements.append(extra)
+
+    replacements = tuple(replacements)
+    REPLACEMENTS[delimiters] = replacements
+    return replacements
+
+def normalize(msg, delimiters):
+    """
+    Replaces all the extra delimiters in the passed in message with the first delimiter
+    """
+    delimiter = delimiters[0]
+    for extra in get_replacements(delimiters):
+        msg = msg.replace(extra, delimiter)
+
+    return msg
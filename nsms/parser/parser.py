@@ -1,10 +1,169 @@
 import re
-import datetime
+from .dates import parse_date as clean_date, parse_hour as clean_hour
+from .normalize import normalize, fix_digits
+from .phone import normalize_phone
 
 class ParseException(Exception):
     def __init__(self, msg):
         super(ParseException, self).__init__(msg)
 
+# compiled tokenizers, by delimiter
+TOKENIZERS = dict()
+
+def get_tokenizer(delimiter):
+    """
+    Returns a regex matching a word and the separator that follows it for the passed in
+    delimiter.  A word runs up to the next delimiter, unless it starts with the delimiter
+    in which case it is everything that is left.  The separator is any run of delimiter
+    characters followed by any whitespace.
+    """
+    tokenizer = TOKENIZERS.get(delimiter)
+    if not tokenizer:
+        escaped = re.escape(delimiter)
+        if len(delimiter) == 1:
+            word = r'[^%s]+' % escaped
+        else:
+            word = r'(?:(?!%s)[\s\S])+' % escaped
+
+        tokenizer = re.compile(r'(%s[\s\S]*|%s)([%s]*\s*)' % (escaped, word, escaped), re.UNICODE)
+        TOKENIZERS[delimiter] = tokenizer
+
+    return tokenizer
+
+def clean_phone(phone):
+    """
+    Returns the phone number in the passed in word, or None if it isn't a valid phone number
+    """
+    # if there is a leading '+' strip it
+    if phone and phone[0] == '+':
+        phone = phone[1:]
+
+    # we expect the phone to be number only at this time,
+    # with the situation where 'l' or 'o' are confused to be number
+    phone = fix_digits(phone)
+
+    # make sure it is numeric (an integer)
+    try:
+        int(phone)
+    except:
+        phone = None
+
+    # make sure it is either 10 or 12 digits
+    if phone and len(phone) != 10 and len(phone) != 12:
+        phone = None
+
+    return phone
+
+def clean_int(integer):
+    """
+    Returns the passed in word with any confused characters fixed if it is an integer, or None
+    """
+    # we will torelate the situation where the value 0 or 1 are confused to 'l or o' characters
+    integer = fix_digits(integer)
+
+    # make sure it is numeric (an integer)
+    try:
+        int(integer)
+    except:
+        integer = None
+
+    return integer
+
+def deletes(word):
+    """
+    Returns all the variations of the passed in word with a single character removed
+    """
+    return [word[:i] + word[i+1:] for i in range(len(word))]
+
+class KeywordSet(object):
+    """
+    A precompiled set of keywords which can be passed to Parser.next_keyword in place of a
+    list.  Lookups are case insensitive dictionary lookups, and aliases resolve to the
+    keyword they stand for, eg:
+
+           KEYWORDS = KeywordSet(['miles', 'car'], aliases=dict(m='miles', c='car'), fuzzy=True)
+
+    When fuzzy is set, words which are one typo away from a keyword (a missing, extra, wrong or
+    swapped letter, ie: 'mlies' or 'cra') also match it.  We precompute every keyword with one
+    letter deleted, so matching a word only means looking up the word and its own deletions
+    instead of comparing it against every keyword.  Keywords shorter than fuzzy_min_length are
+    only matched exactly, and typos that could be more than one keyword match none of them.
+
+    fuzzy_hits and fuzzy_misses count how many words were recovered and how many weren't.
+    """
+    def __init__(self, keywords, aliases=None, fuzzy=False, fuzzy_min_length=3):
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.lookup = dict()
+
+        for keyword in self.keywords:
+            self.lookup[keyword] = keyword
+
+        for (alias, keyword) in (aliases or dict()).items():
+            keyword = keyword.lower()
+            if not keyword in self.lookup:
+                raise ValueError("Alias '%s' is for unknown keyword '%s'" % (alias, keyword))
+            self.lookup[alias.lower()] = keyword
+
+        self.fuzzy = fuzzy
+        self.fuzzy_hits = 0
+        self.fuzzy_misses = 0
+
+        # our index of deletions, variations shared by more than one keyword map to None
+        self.typos = dict()
+        if fuzzy:
+            for (word, keyword) in self.lookup.items():
+                if len(word) < fuzzy_min_length:
+                    continue
+
+                for variation in [word] + deletes(word):
+                    if self.typos.get(variation, keyword) != keyword:
+                        self.typos[variation] = None
+                    else:
+                        self.typos[variation] = keyword
+
+    def get(self, word):
+        """
+        Returns the keyword for the passed in word, or None if it isn't one of ours
+        """
+        word = word.lower()
+        keyword = self.lookup.get(word)
+
+        if keyword is None and self.fuzzy:
+            keyword = self.get_fuzzy(word)
+
+        return keyword
+
+    def get_fuzzy(self, word, count=True):
+        """
+        Returns the single keyword the passed in word is a typo of, or None.  Set count to False
+        to not count the lookup in fuzzy_hits and fuzzy_misses, ie: when routing a message to
+        the app which will look its keyword up again.
+        """
+        typos = self.typos
+        matches = set()
+
+        for variation in [word] + deletes(word):
+            if variation in typos:
+                matches.add(typos[variation])
+
+        if len(matches) == 1 and not None in matches:
+            if count:
+                self.fuzzy_hits += 1
+            return matches.pop()
+
+        if count:
+            self.fuzzy_misses += 1
+        return None
+
+    def __contains__(self, word):
+        return word.lower() in self.lookup
+
+    def __iter__(self):
+        return iter(self.lookup)
+
+    def __len__(self):
+        return len(self.lookup)
+
 class Parser(object):
 
     def __init__(self, msg, *args):
@@ -13,33 +172,116 @@ class Parser(object):
         self.args = args
         if args:
             self.delimiter = args[0]
-            for arg_count in range(1,len(args)):
-                self.msg = self.msg.replace(args[arg_count],self.delimiter)
+            self.msg = normalize(self.msg, args)
 
         # delimiters delimiters at both ends and space if available
         self.rest = self.msg.strip(self.delimiter).strip()
-        
+
+    def get_rest(self):
+        (start, end) = self._get_offsets()[self._cursor]
+        return self._text[start:end]
+
+    def set_rest(self, rest):
+        self._tokenize(rest)
+
+    rest = property(get_rest, set_rest)
+
+    def _tokenize(self, text):
+        """
+        Splits the passed in text into words a single time, our cursor then indexes into
+        the list of words as they are consumed.
+        """
+        self._text = text
+        self._cursor = 0
+        self._offsets = None
+
+        # the remainder of our message is stripped again after every word, that only changes its
+        # end if it finishes with a delimiter, otherwise one regex pass gives us all our words
+        if self.delimiter and text and not text[-1] in self.delimiter and not text[-1].isspace():
+            self._segments = get_tokenizer(self.delimiter).findall(text)
+            self._words = [word for (word, separator) in self._segments]
+        else:
+            self._segments = None
+            self._words = []
+            self._offsets = self._walk_offsets()
+
+    def _walk_offsets(self):
+        """
+        Walks our text word by word, stripping the remainder after each word exactly as
+        rest.strip(delimiter).strip() would, but working on offsets so nothing is copied.
+        Returns the (start, end) of the remainder of the message before each word.
+        """
+        text = self._text
+        delimiter = self.delimiter
+
+        offsets = []
+        start = 0
+        end = len(text)
+        while start < end:
+            offsets.append((start, end))
+
+            next_delimiter = text.find(delimiter, start, end)
+            if next_delimiter > start:
+                self._words.append(text[start:next_delimiter])
+
+                start = next_delimiter
+                while start < end and text[start] in delimiter:
+                    start += 1
+                while end > start and text[end-1] in delimiter:
+                    end -= 1
+                while start < end and text[start].isspace():
+                    start += 1
+                while end > start and text[end-1].isspace():
+                    end -= 1
+            else:
+                self._words.append(text[start:end])
+                start = end
+
+        offsets.append((start, end))
+        return offsets
+
+    def _get_offsets(self):
+        """
+        Returns the (start, end) of the remainder of the message before each word, only built
+        when someone asks for our rest or word count.
+        """
+        if self._offsets is None:
+            end = len(self._text)
+            start = 0
+            offsets = []
+            for (word, separator) in self._segments:
+                offsets.append((start, end))
+                start += len(word) + len(separator)
+
+            offsets.append((start, end))
+            self._offsets = offsets
+
+        return self._offsets
 
     def get_word_count(self):
-        if len(self.rest) > 0:
-            return len(self.rest.split(self.delimiter))
+        (start, end) = self._get_offsets()[self._cursor]
+        if end > start:
+            return self._text.count(self.delimiter, start, end) + 1
         return 0
 
     word_count = property(get_word_count)
 
     def has_word(self):
-        return self.word_count > 0
+        return self._cursor < len(self._words)
 
     def next_keyword(self, keywords, error_msg=None):
         segment = self.next_word(error_msg)
         keyword = None
 
         if segment:
-            segment = segment.lower()
-            for curr in keywords:
-                if curr.lower() == segment:
-                    keyword = curr.lower()
-                    break
+            if isinstance(keywords, KeywordSet):
+                keyword = keywords.get(segment)
+            else:
+                segment = segment.lower()
+                for curr in keywords:
+                    if curr.lower() == segment:
+                        keyword = curr.lower()
+                        break
 
         if not keyword and error_msg:
             raise ParseException(error_msg)
@@ -47,16 +289,11 @@ class Parser(object):
             return keyword
 
     def next_word(self, error_msg=None):
-        next_delimiter = self.rest.find(self.delimiter)
         word = None
 
-        if next_delimiter > 0:
-            word = self.rest[:next_delimiter]
-
-            self.rest = self.rest[next_delimiter:].strip(self.delimiter).strip()
-        elif self.rest:
-            word = self.rest
-            self.rest = ""
+        if self._cursor < len(self._words):
+            word = self._words[self._cursor]
+            self._cursor += 1
 
         if not word and error_msg:
             raise ParseException(error_msg)
@@ -67,61 +304,30 @@ class Parser(object):
         self.rest = "%s %s" % (word, self.rest)
 
     def peek_word(self):
-        next_space = self.rest.find(self.delimiter)
         word = None
 
-        if next_space > 0:
-            word = self.rest[:next_space]
-        elif self.rest:
-            word = self.rest
+        if self._cursor < len(self._words):
+            word = self._words[self._cursor]
 
         return word
     
     def next_hour(self, error_msg=None):
-        hour = self.next_word(error_msg)
-
-        # considering the context of a feature phone it is easy to confuse
-        # 'l' to 1 and 'o' to 0, lets handle this situation
-        if hour:
-            hour = hour.replace('l', '1').replace('o', '0').replace('O', '0')
+        hour = clean_hour(self.next_word(error_msg))
 
-        # four digits means this is hour and minute (1312 for 13), we care only about hour
-        if len(hour) == 4:
-            hour = hour[:2]
-
-        # hours need to be integers
-        try:
-            hour_int = int(hour)
-        except:
+        if hour is None:
             raise ParseException(error_msg)
 
-        # hours should be in 24 hour format, ie, 00-23
-        if hour_int < 0 or hour_int > 23:
-            raise ParseException(error_msg)            
-
-        return hour_int
+        return hour
 
-    def next_phone(self, error_msg=None):
-        phone = self.next_word(error_msg)
-        
-        # if there is a leading '+' strip it
-        if phone and phone[0] == '+':
-            phone = phone[1:]
-
-        # we expect the phone to be number only at this time,
-        # with the situation where 'l' or 'o' are confused to be number
-        if phone:
-            phone = phone.replace('l', '1').replace('o', '0').replace('O', '0')
-
-        # make sure it is numeric (an integer)
-        try:
-            int(phone)
-        except:
-            phone = None
-
-        # make sure it is either 10 or 12 digits
-        if phone and len(phone) != 10 and len(phone) != 12:
-            phone = None
+    def next_phone(self, error_msg=None, country_code=None):
+        """
+        Returns the next word if it is a 10 or 12 digit phone number.  If a country code is passed
+        in, any valid phone number is accepted and returned in E.164 form, see normalize_phone.
+        """
+        if country_code:
+            phone = normalize_phone(self.next_word(error_msg), country_code, fix=True)
+        else:
+            phone = clean_phone(self.next_word(error_msg))
 
         if phone is None and error_msg:
             raise ParseException(error_msg)
@@ -129,17 +335,7 @@ class Parser(object):
         return phone
 
     def next_int(self, error_msg=None):
-        integer = self.next_word(error_msg)
-
-        # we will torelate the situation where the value 0 or 1 are confused to 'l or o' characters
-        if integer:
-            integer = integer.replace('l', '1').replace('o', '0').replace('O', '0')
-
-        # make sure it is numeric (an integer)
-        try:
-            int(integer)
-        except:
-            integer = None
+        integer = clean_int(self.next_word(error_msg))
 
         if integer is None and error_msg:
             raise ParseException(error_msg)
@@ -147,37 +343,7 @@ class Parser(object):
         return integer
 
     def next_date(self, error_msg=None):
-        date = self.next_word(error_msg)
-
-        # does it match our format?  dd[separator]mm[separator]yy 
-        date_regex = r'(\d+)[\.|\/|-](\d+)[\.|\/|-](\d+)'
-        match = re.search(date_regex, date)
-        if not match:
-            date = None
-        else:
-            try:
-                # now that we expect day month and year to be integer values there is a probability
-                day = int(match.group(1))
-                month = int(match.group(2))
-                year = int(match.group(3))
-
-                # two digit date, we'll figure out whether to add 1900 or 2000 based on the current date
-                if year < 100:
-                    this_year = datetime.datetime.now().date().year
-
-                    # our first assumption is that it is in the 2000s.. but if the year is greater than today + 5
-                    # (arbitrary but seems sane) then we downgrade it to 1900s
-                    year = year + 2000
-                    if year > this_year + 5:
-                        year = year - 100
-
-                # year has to be more than 1000 in our world
-                if year > 1000:
-                    date = datetime.date(day=day, month=month, year=year)
-                else:
-                    date = None
-            except:
-                date = None
+        date = clean_date(self.next_word(error_msg))
 
         if not date and error_msg:
             raise ParseException(error_msg)
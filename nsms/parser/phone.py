@@ -0,0 +1,60 @@
+import re
+from nsms.lru import LRUCache
+from .normalize import fix_digits
+
+# formatting characters people and backends put in phone numbers
+FORMATTING_REGEX = re.compile(r'[\s\-\.\(\)]')
+DIGITS_REGEX = re.compile(r'^[0-9]+$')
+
+# E.164 numbers are at most 15 digits, and like before we consider anything shorter than 10 to be a short code
+MIN_LENGTH = 10
+MAX_LENGTH = 15
+
+# normalized numbers, keyed by the raw number, country code and whether digits were fixed
+PHONES = LRUCache(10000)
+MISSING = object()
+
+def normalize_phone(raw, country_code, fix=False):
+    """
+    Returns the passed in phone number in E.164 form, without the leading '+' as our backends
+    and connections use, or None if it isn't a valid phone number.
+
+           +250 788 383 388  -> 250788383388
+           00250788383388    -> 250788383388
+           0788383388        -> 250788383388 (with a country code of 250)
+           250788383388      -> 250788383388
+
+    Numbers without a '+', '00' or '0' prefix are taken to already include their country code,
+    and national numbers are left as they are when we have no country code.
+    Setting fix replaces letters commonly confused with digits, which we want for numbers typed
+    in messages but not for the identities of senders.  Results are cached by raw number.
+    """
+    if not raw:
+        return None
+
+    key = (raw, country_code, fix)
+    phone = PHONES.get(key, MISSING)
+
+    if phone is MISSING:
+        phone = _normalize_phone(raw, country_code, fix)
+        PHONES.set(key, phone)
+
+    return phone
+
+def _normalize_phone(raw, country_code, fix):
+    digits = FORMATTING_REGEX.sub('', raw)
+    if fix:
+        digits = fix_digits(digits)
+
+    if digits.startswith('+'):
+        digits = digits[1:]
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    # national numbers, without a country code we take them as they are, like we always have
+    elif digits.startswith('0') and country_code:
+        digits = "%s%s" % (country_code, digits[1:])
+
+    if not DIGITS_REGEX.match(digits) or len(digits) < MIN_LENGTH or len(digits) > MAX_LENGTH:
+        return None
+
+    return digits
@@ -1,5 +1,12 @@
 from django.test import TestCase
-from .parser import Parser
+from .parser import Parser, ParseException, KeywordSet
+from .grammar import Grammar, Grammars
+from .batch import parse_batch
+from .dates import DateParser
+from .normalize import normalize, get_replacements
+from .phone import normalize_phone, PHONES
+from .corpus import generate_corpus
+from .bench import measure, METHODS
 import datetime
 
 class ParserTest(TestCase):
@@ -98,6 +105,73 @@ class ParserTest(TestCase):
         self.assertNextKeyword(None, ",", KEYWORDS, ',', ' ', '.')
         self.assertNextKeyword(None, ".", KEYWORDS, '.', ' ', '.')
 
+    def test_keyword_set(self):
+        KEYWORDS = KeywordSet(["Miles", "car"], aliases=dict(m='miles', C='car'))
+
+        self.assertEquals("miles", KEYWORDS.get("MILES"))
+        self.assertEquals("miles", KEYWORDS.get("m"))
+        self.assertEquals("car", KEYWORDS.get("c"))
+        self.assertEquals(None, KEYWORDS.get("lang"))
+        self.assertTrue("M" in KEYWORDS)
+        self.assertEquals(4, len(KEYWORDS))
+
+        self.assertNextKeyword("miles", "M 120", KEYWORDS)
+        self.assertNextKeyword("car", "Car, RAB123CD", KEYWORDS, ',')
+        self.assertNextKeyword(None, "notkeyword bach", KEYWORDS)
+        self.assertNextKeyword(None, " ", KEYWORDS)
+
+        parser = Parser("lang rw")
+        self.assertRaises(ParseException, parser.next_keyword, KEYWORDS, "Unknown keyword")
+
+        self.assertRaises(ValueError, KeywordSet, ["miles"], dict(c='car'))
+
+    def test_fuzzy_keywords(self):
+        KEYWORDS = KeywordSet(["miles", "car", "cars", "lang"], aliases=dict(m='miles', c='car'), fuzzy=True)
+
+        # exact matches don't count as fuzzy hits
+        self.assertEquals("miles", KEYWORDS.get("miles"))
+        self.assertEquals("cars", KEYWORDS.get("cars"))
+        self.assertEquals(0, KEYWORDS.fuzzy_hits)
+        self.assertEquals(0, KEYWORDS.fuzzy_misses)
+
+        # swapped, missing, extra and wrong letters
+        self.assertEquals("miles", KEYWORDS.get("MLIES"))
+        self.assertEquals("miles", KEYWORDS.get("mils"))
+        self.assertEquals("miles", KEYWORDS.get("milees"))
+        self.assertEquals("lang", KEYWORDS.get("lanf"))
+        self.assertEquals(4, KEYWORDS.fuzzy_hits)
+
+        # too far away, or ambiguous between car and cars
+        self.assertEquals(None, KEYWORDS.get("mlise"))
+        self.assertEquals(None, KEYWORDS.get("cart"))
+        self.assertEquals(None, KEYWORDS.get("x"))
+        self.assertEquals(3, KEYWORDS.fuzzy_misses)
+
+        # lookups can also leave our counts alone
+        self.assertEquals("miles", KEYWORDS.get_fuzzy("mlies", count=False))
+        self.assertEquals(None, KEYWORDS.get_fuzzy("mlise", count=False))
+        self.assertEquals(4, KEYWORDS.fuzzy_hits)
+        self.assertEquals(3, KEYWORDS.fuzzy_misses)
+
+        KEYWORDS = KeywordSet(["miles", "car"], aliases=dict(m='miles', c='car'), fuzzy=True)
+        self.assertNextKeyword("car", "cra RAB123CD", KEYWORDS)
+        self.assertNextKeyword("miles", "mlies 120", KEYWORDS)
+
+        # short aliases are never matched fuzzily
+        self.assertNextKeyword(None, "x 120", KEYWORDS)
+
+        # and fuzzy matching is off by default
+        self.assertNextKeyword(None, "mlies 120", KeywordSet(["miles"]))
+
+    def test_normalize(self):
+        self.assertEquals("reg.james.kirk", normalize("reg james,kirk", ('.', ' ', ',')))
+        self.assertEquals((), get_replacements(('.', '.', '.', '.')))
+        self.assertEquals((' ', ','), get_replacements(('.', ' ', ',', ' ', '.')))
+
+        # extra delimiters that are part of the first one change the message each time they are replaced
+        self.assertEquals((',', ','), get_replacements((', ', ',', ',')))
+        self.assertEquals("a,   b", normalize("a, b", (', ', ',', ',')))
+
     def assertNextHour(self, truth, sms, *args):
         parser = Parser(sms, *args)
         self.assertEquals(truth, parser.next_hour())
@@ -173,6 +247,35 @@ class ParserTest(TestCase):
         self.assertNextPhone(None, "07883833881", '.', ' ', ',')
         self.assertNextPhone(None, "07883833881", '.', ' ', ',')
 
+    def test_e164_phones(self):
+        self.assertEquals("250788383388", normalize_phone("+250 788 383 388", "250"))
+        self.assertEquals("250788383388", normalize_phone("00250788383388", "250"))
+        self.assertEquals("250788383388", normalize_phone("0788-383-388", "250"))
+        self.assertEquals("250788383388", normalize_phone("250788383388", "250"))
+        self.assertEquals("12065551212", normalize_phone("12065551212", "250"))
+
+        # short codes, alpha numeric senders and numbers that are too long
+        self.assertEquals(None, normalize_phone("3456", "250"))
+        self.assertEquals(None, normalize_phone("MTN", "250"))
+        self.assertEquals(None, normalize_phone("+2507883833881234", "250"))
+        self.assertEquals(None, normalize_phone("", "250"))
+
+        # without a country code national numbers are taken as they are
+        self.assertEquals("0788383388", normalize_phone("0788383388", None))
+        self.assertEquals("0788383388", normalize_phone("078 838 3388", None))
+        self.assertEquals(None, normalize_phone("078838", None))
+
+        # digits are only fixed when asked
+        self.assertEquals(None, normalize_phone("o788383388", "250"))
+        self.assertEquals("250788383388", normalize_phone("o788383388", "250", fix=True))
+
+        # and our results are cached, including misses
+        self.assertTrue(("MTN", "250", False) in PHONES)
+
+        parser = Parser("0788383388 +250 788383388")
+        self.assertEquals("250788383388", parser.next_phone(country_code="250"))
+        self.assertEquals(None, parser.next_phone(country_code="250"))
+
     def assertNextInt(self, truth_int, sms, *args):
         parser = Parser(sms, *args)
         self.assertEquals(truth_int, parser.next_int())
@@ -233,6 +336,34 @@ class ParserTest(TestCase):
         self.assertNextDate(None, None, None, "10;12;31")
         self.assertNextDate(None, None, None, "10:12:31")
 
+    def test_date_formats(self):
+        # a wednesday
+        dates = DateParser(get_today=lambda: datetime.date(day=15, month=6, year=2011))
+
+        self.assertEquals(datetime.date(day=23, month=6, year=1977), dates.parse_date("230677"))
+        self.assertEquals(datetime.date(day=23, month=6, year=2011), dates.parse_date("23062011"))
+        self.assertEquals(datetime.date(day=23, month=6, year=2016), dates.parse_date("23.06.16"))
+        self.assertEquals(datetime.date(day=23, month=6, year=1917), dates.parse_date("23.06.17"))
+        self.assertEquals(datetime.date(day=3, month=2, year=2011), dates.parse_date("3/2"))
+        self.assertEquals(None, dates.parse_date("31/2"))
+        self.assertEquals(None, dates.parse_date("310277"))
+
+        self.assertEquals(datetime.date(day=15, month=6, year=2011), dates.parse_date("wednesday"))
+        self.assertEquals(datetime.date(day=13, month=6, year=2011), dates.parse_date("Mon"))
+        self.assertEquals(datetime.date(day=9, month=6, year=2011), dates.parse_date("jeudi"))
+        self.assertEquals(None, dates.parse_date("someday"))
+
+        # results are memoized
+        self.assertEquals(datetime.date(day=23, month=6, year=1977), dates.cache[('date', "230677")])
+
+        self.assertEquals(13, dates.parse_hour("13h30"))
+        self.assertEquals(13, dates.parse_hour("l3:3o"))
+        self.assertEquals(9, dates.parse_hour("9h"))
+        self.assertEquals(None, dates.parse_hour("25h"))
+        self.assertEquals(None, dates.parse_hour("noon"))
+
+        self.assertNextHour(13, " 13h30 CET")
+
     def assertWordCount(self, truth, sms, *args):
         parser = Parser(sms, *args)
         self.assertEquals(truth, parser.word_count)
@@ -332,3 +463,153 @@ class ParserTest(TestCase):
 
         self.assertFalse(parser.has_word())
 
+    def test_rest_and_insert(self):
+        parser = Parser("REG, James,, Kirk", ',')
+
+        # empty segments still count as words
+        self.assertEquals(4, parser.word_count)
+        self.assertEquals("REG, James,, Kirk", parser.rest)
+        self.assertEquals("REG", parser.peek_word())
+        self.assertEquals("REG", parser.next_word())
+
+        self.assertEquals("James,, Kirk", parser.rest)
+        self.assertEquals(3, parser.word_count)
+        self.assertEquals("James", parser.next_word())
+        self.assertEquals("Kirk", parser.peek_word())
+
+        # inserted words are always followed by a space
+        parser.insert_word("Captain")
+        self.assertEquals("Captain Kirk", parser.rest)
+        self.assertEquals("Captain Kirk", parser.next_word())
+        self.assertFalse(parser.has_word())
+        self.assertEquals(0, parser.word_count)
+
+        # messages ending with delimiters get stripped again after every word
+        parser = Parser("a, ,b, ,", ',')
+        self.assertEquals("a, ,b,", parser.rest)
+        self.assertEquals("a", parser.next_word())
+        self.assertEquals(",b", parser.rest)
+        self.assertEquals(",b", parser.next_word())
+        self.assertEquals(None, parser.next_word())
+
+    def test_long_message(self):
+        words = ["word%d" % i for i in range(500)]
+
+        parser = Parser(" ".join(words))
+        self.assertEquals(500, parser.word_count)
+
+        for word in words:
+            self.assertEquals(word, parser.next_word())
+
+        self.assertFalse(parser.has_word())
+        self.assertEquals(None, parser.next_word())
+
+        parser = Parser(", ".join(words), ',', ' ')
+        for word in words:
+            self.assertEquals(word, parser.next_word())
+
+        self.assertFalse(parser.has_word())
+
+class GrammarTest(TestCase):
+
+    def assertParseError(self, error, grammar, sms):
+        try:
+            grammar.match(sms)
+            self.fail("Expected ParseException for '%s'" % sms)
+        except ParseException as e:
+            self.assertEquals(error, str(e))
+
+    def test_grammar(self):
+        miles = Grammar('miles|m <int:miles>', error="bad miles")
+
+        record = miles.match("MILES l20")
+        self.assertEquals('miles', record.keyword)
+        self.assertEquals(120, record.miles)
+        self.assertEquals(120, miles.match("m 120 extra words").miles)
+
+        self.assertEquals(None, miles.match("car 120"))
+        self.assertEquals(None, miles.match(""))
+
+        self.assertParseError("bad miles", miles, "miles")
+        self.assertParseError("bad miles", miles, "miles abc")
+
+        car = Grammar('car|c <word(8):plate>', error="bad car", errors=dict(plate="bad plate"))
+        self.assertEquals("RAB123CD", car.match("c RAB123CD").plate)
+        self.assertParseError("bad car", car, "car")
+        self.assertParseError("bad plate", car, "car RAB12")
+
+        reg = Grammar('reg <word:name> <date:birth> <phone:phone> at <hour:hour> <text:note>',
+                      error="bad reg", delimiters=(' ', ',', '.'))
+        record = reg.match("REG.James,10/12/44 0788383381 at 1245, beam me up")
+        self.assertEquals(('reg', 'James', datetime.date(day=10, month=12, year=1944), '0788383381', 12, "beam me up"),
+                          tuple(record))
+
+        self.assertParseError("bad reg", reg, "reg James 10/12/44 0788383381 on 1245")
+        self.assertParseError("bad reg", reg, "reg James 10/13/44 0788383381 at 1245")
+
+        self.assertRaises(ValueError, Grammar, '<int:miles>')
+        self.assertRaises(ValueError, Grammar, 'miles <int:miles> <int:miles>')
+        self.assertRaises(ValueError, Grammar, 'miles <float:miles>')
+        self.assertRaises(ValueError, Grammar, 'miles <text:note> <int:miles>')
+
+    def test_grammars(self):
+        grammars = Grammars(Grammar('miles|m <int:miles>', error="bad miles"),
+                            Grammar('car|c <word(8):plate>', error="bad car"))
+
+        self.assertEquals(frozenset(['miles', 'm', 'car', 'c']), frozenset(grammars.keywords))
+        self.assertEquals(('miles', 45), tuple(grammars.match("M 45")))
+        self.assertEquals(('car', "RAB123CD"), tuple(grammars.match("car RAB123CD")))
+        self.assertEquals(None, grammars.match("lang rw"))
+        self.assertEquals(None, grammars.match(" "))
+        self.assertEquals(None, grammars.match("mlies 45"))
+
+        grammars = Grammars(Grammar('miles|m <int:miles>'), Grammar('car|c <word(8):plate>'), fuzzy=True)
+        self.assertEquals(('miles', 45), tuple(grammars.match("mlies 45")))
+        self.assertEquals(1, grammars.keywords.fuzzy_hits)
+
+        self.assertRaises(ValueError, Grammars, Grammar('miles <int:miles>'), Grammar('miles <word:name>'))
+
+    def test_parse_batch(self):
+        grammars = Grammars(Grammar('miles|m <int:miles>', error="bad miles"),
+                            Grammar('car|c <word(8):plate>', error="bad car", errors=dict(plate="bad plate")))
+
+        texts = ["m 120", "car RAB123CD", "lang rw", "miles", "car RAB", ""] * 3
+
+        for processes in (None, 2):
+            results = list(parse_batch(grammars, iter(texts), processes=processes, chunk_size=4))
+            self.assertEquals(len(texts), len(results))
+
+            self.assertEquals(('miles', 120), tuple(results[0].record))
+            self.assertEquals(120, results[0].record.miles)
+            self.assertEquals(('car', "RAB123CD"), tuple(results[1].record))
+            self.assertEquals([None, None, 'unrecognized', 'format', 'plate', 'unrecognized'],
+                              [result.code for result in results[:6]])
+            self.assertEquals([None, None, None, "bad miles", "bad plate", None],
+                              [result.error for result in results[:6]])
+            self.assertEquals(texts, [result.text for result in results])
+
+        results = list(parse_batch(Grammar('miles <int:miles>'), ["miles 45", "miles x"]))
+        self.assertEquals(45, results[0].record.miles)
+        self.assertEquals('miles', results[1].code)
+
+class BenchmarkTest(TestCase):
+
+    def test_corpus(self):
+        corpus = generate_corpus(200, seed=4)
+
+        self.assertEquals(200, len(corpus))
+        self.assertEquals(corpus, generate_corpus(200, seed=4))
+        self.assertNotEquals(corpus, generate_corpus(200, seed=5))
+
+        kinds = set([kind for (kind, text, delimiters) in corpus])
+        self.assertEquals(set(['keyword', 'typo', 'registration', 'report', 'multipart']), kinds)
+
+    def test_measure(self):
+        corpus = generate_corpus(20)
+
+        for (name, method) in METHODS:
+            result = measure(method, corpus, 1)
+            self.assertTrue(result['ops_per_sec'] > 0)
+
+            # always reported, null where we can't measure allocations
+            self.assertTrue('peak_bytes_per_op' in result)
@@ -1,7 +1,8 @@
 from rapidsms.apps.base import AppBase
 from .models import *
-from nsms.text.models import gettext as _
-from nsms.parser import Parser, ParseException
+from nsms.text import gettext as _
+from nsms.parser import Parser, ParseException, KeywordSet
+from nsms.utils import get_message_context
 from rapidsms.models import Backend, Connection
 from django.utils import translation
 from rapidsms_httprouter.router import get_router
@@ -9,7 +10,7 @@ from django.template import Template, Context
 from django.conf import settings
 import re
 
-KEYWORDS = [ 'm', 'miles', 'c', 'car' ]
+KEYWORDS = KeywordSet([ 'miles', 'car' ], aliases=dict(m='miles', c='car'), fuzzy=True)
 
 _('unrecognized', "That message is not recognized, must start with miles or car")
 _('car-invalid-license', "Invalid license plate, it must be 8 letters")
@@ -23,25 +24,21 @@ _('bad-miles-format', "Error, mileage reports must take the form: miles [mileage
 _('error', "An unexpected error occurred, please check your message and try again")
 
 class App(AppBase):
-    
-    def handle (self, message):
-        # activate our default language
-        translation.activate(settings.DEFAULT_SMS_LANGUAGE)
 
-        # if the number looks like something informational or SPAM, ignore
-        identity = message.connection.identity
+    # the keywords we own, used by nsms.dispatch to route messages to us
+    keywords = KEYWORDS
 
-        # first case, alpha num identity
-        try:
-            number = int(identity)
-        except:
-            # ignore this message, the sender isn't numeric
-            return False
+    def handle (self, message):
+        context = get_message_context(message)
 
-        # now test that it is 10 digits or more, ignore anything shorter
-        if len(identity) < 10:
+        # if the number looks like something informational or SPAM, ignore, before we look
+        # up or create a profile for it
+        if not context.identity:
             return False
 
+        # activate the language for this sender, our default language if they have no profile
+        context.activate_language()
+
         # ok sender looks ok, let's get on with it
 
         try:
@@ -70,10 +67,10 @@ class App(AppBase):
         parser = Parser(message.text)
         keyword = parser.next_keyword(KEYWORDS, _('unrecognized', "That message is not recognized, must start with miles or car"))
 
-        if keyword in ['car', 'c']:
+        if keyword == 'car':
             return self.handle_car(message, parser)
 
-        elif keyword in ['miles', 'm']:
+        elif keyword == 'miles':
             return self.handle_miles(message, parser)
 
     def handle_car(self, message, parser):
@@ -93,7 +90,7 @@ class App(AppBase):
         miles = parser.next_int(bad_format)
 
         # look up whether this connection has a car
-        car = Car.for_connection(message.connection)
+        car = get_message_context(message).memoize('car', lambda: Car.for_connection(message.connection))
         if not car:
             return _('miles-no-car', "You are not registered to be using a car, send: car [license plate] to register")
 
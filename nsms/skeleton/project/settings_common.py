@@ -324,6 +324,32 @@ DEFAULT_BACKEND = "console"
 # change this to the country code for your install
 DEFAULT_COUNTRY_CODE = "250"
 
+# the rules incoming messages are checked against before being saved, see nsms.spam.prefilter,
+# set the mode to 'count' to only count the messages matching them instead of dropping them
+SPAM_PREFILTER_RULES = (('not-a-phone', 'invalid', None),)
+SPAM_PREFILTER_MODE = 'drop'
+
+# how many messages each sender can send, see nsms.spam.app, None to not limit senders
+SPAM_RATE_LIMIT = dict(per_minute=30, burst=30, action='notice', shared=False)
+
+# copies of a message from the same sender within this many seconds are ignored, set shared
+# to True to catch copies across workers using our cache
+SPAM_DUPLICATE_WINDOW = 60
+SPAM_DUPLICATE_SHARED = False
+
+# the help app only sends help to each connection once in this many seconds
+HELP_REPLY_WINDOW = 600
+HELP_REPLY_SHARED = False
+
+# set this to a directory to have workers read our strings from catalog files exported
+# there by 'python manage.py export_texts' instead of the database, workers export them
+# again when they see the files are out of date
+TEXT_CATALOG_DIR = None
+
+# how often, in seconds, workers check for strings edited in other processes, using our
+# cache if it is shared, our database otherwise
+TEXT_INVALIDATION_INTERVAL = 5
+
 #-----------------------------------------------------------------------------------
 # Debug Toolbar
 #-----------------------------------------------------------------------------------
@@ -7,6 +7,7 @@ urlpatterns = patterns('',
     url(r'^users/', include('smartmin.users.urls')),
     url(r'^text/', include('nsms.text.urls')),
     url('^console/', include('nsms.console.urls')),
+    url('', include('nsms.spam.urls')),
     url('', include('rapidsms_httprouter.urls')),
 
     # add your apps here
@@ -1,25 +1,82 @@
 from rapidsms.apps.base import AppBase
-import re
+from nsms.text import gettext as _
+from nsms.utils import get_message_context
+from .ratelimit import get_limiter
+from .duplicates import get_detector, get_message_key
+
+_('rate-limited', "You are sending too many messages, please wait a few minutes before sending more.")
 
 class App(AppBase):
     """
     This app is responsible for filtering out messages that seem to be coming from short codes, 
     as these are usually SPAM in one way or another.
+
+    It also limits how many messages each sender can send if SPAM_RATE_LIMIT is set in your
+    settings, ie:
+
+           SPAM_RATE_LIMIT = dict(per_minute=10, burst=20, action='notice', shared=True)
+
+    Messages over the limit are dropped silently with the 'drop' action, dropped with a notice
+    sent the first time with 'notice', or handled again once the sender has room with 'defer',
+    which needs celery.  Deferred messages reserve their place in the sender's bucket, so they
+    are handled one after the other at the sender's rate, and are handled again as the message
+    we already have.  Once a sender has a full bucket of messages deferred, we drop the rest.
+
+    Copies of the same message from the same sender arriving within SPAM_DUPLICATE_WINDOW
+    seconds are also filtered, so they are saved and acknowledged but no app handles them.
+    Messages dropped for being over the limit are forgotten, so the sender can send them again.
     """
+
+    def filter(self, message):
+        # a message we deferred, it has already been counted
+        if getattr(message, 'replayed', None) == 'deferred':
+            return False
+
+        connection = message.connection
+        identity = get_message_context(message).identity or connection.identity
+
+        # the same message again, we've already dealt with it
+        detector = get_detector()
+        if detector:
+            message_key = get_message_key(connection.backend.name, identity, message.text)
+            if detector.is_duplicate(message_key):
+                return True
+
+        limiter = get_limiter()
+        if not limiter:
+            return False
+
+        key = "%s_%s" % (connection.backend.name, identity)
+
+        (allowed, first) = limiter.consume(key)
+        if allowed:
+            return False
+
+        if limiter.action == 'notice' and first:
+            message.respond(_('rate-limited', "You are sending too many messages, please wait a few minutes before sending more."))
+
+        elif limiter.action == 'defer':
+            db_message = getattr(message, 'db_message', None)
+            wait = limiter.reserve(key) if db_message else None
+
+            if wait is not None:
+                from .tasks import handle_deferred
+                handle_deferred.apply_async(args=[db_message.id, message.text], countdown=wait)
+
+                # it will be handled, so copies of it are still copies
+                return True
+
+        # this message won't be handled, so sending it again once they have room isn't a copy
+        if detector:
+            detector.forget(message_key)
+
+        # over the limit, stop here
+        return True
     
     def handle (self, message):
-        # if the number looks like something informational or SPAM, ignore
-        identity = message.connection.identity
-
-        # first case, alpha num identity
-        try:
-            number = int(identity)
-        except:
-            # ignore this message, the sender isn't numeric
-            return True
-
-        # now test that it is 10 digits or more, ignore anything shorter
-        if len(identity) < 10:
+        # if the number looks like something informational or SPAM, ignore, that is
+        # alpha numeric identities and short codes which aren't valid phone numbers
+        if not get_message_context(message).identity:
             return True
 
         # look ok, let another app handle this message
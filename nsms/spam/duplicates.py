@@ -0,0 +1,73 @@
+import time
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from nsms.lru import LRUCache
+
+def get_message_key(backend, identity, text):
+    """
+    Returns the hash we use to recognize the same message arriving more than once
+    """
+    return hashlib.md5((u"%s|%s|%s" % (backend, identity, text)).encode('utf-8')).hexdigest()
+
+class DuplicateDetector(object):
+    """
+    Remembers the messages we've seen in the last window seconds, so that copies of a message
+    sent again by an aggregator retrying on a timeout can be recognized.  Messages are kept in a
+    bounded in-process LRU, or in our Django cache when shared is set so that a copy is caught
+    even when it reaches a different worker.
+    """
+    def __init__(self, window=60, shared=False, max_size=10000):
+        self.window = window
+        self.shared = shared
+        self.seen = LRUCache(max_size)
+        self.duplicates = 0
+
+    def is_duplicate(self, key, now=None):
+        """
+        Returns whether we've seen the message with the passed in key within our window, and
+        remembers it if we haven't.
+        """
+        if self.shared:
+            # add only sets keys that don't exist yet, so only the first copy gets through
+            duplicate = not cache.add("nsms_dupe_%s" % key, 1, self.window)
+
+        else:
+            if now is None:
+                now = time.time()
+
+            seen = self.seen.get(key)
+            duplicate = seen is not None and now - seen < self.window
+            if not duplicate:
+                self.seen.set(key, now)
+
+        if duplicate:
+            self.duplicates += 1
+
+        return duplicate
+
+    def forget(self, key):
+        """
+        Forgets the message with the passed in key, so that the same message is let through again
+        """
+        if self.shared:
+            cache.delete("nsms_dupe_%s" % key)
+        else:
+            self.seen.delete(key)
+
+DETECTOR = None
+
+def get_detector():
+    """
+    Returns our shared duplicate detector configured by SPAM_DUPLICATE_WINDOW and
+    SPAM_DUPLICATE_SHARED, or None if SPAM_DUPLICATE_WINDOW isn't set
+    """
+    global DETECTOR
+    window = getattr(settings, 'SPAM_DUPLICATE_WINDOW', None)
+    if not window:
+        return None
+
+    if DETECTOR is None:
+        DETECTOR = DuplicateDetector(window, getattr(settings, 'SPAM_DUPLICATE_SHARED', False))
+
+    return DETECTOR
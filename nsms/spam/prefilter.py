@@ -0,0 +1,86 @@
+import re
+from django.conf import settings
+from nsms.utils import normalize_identity
+
+# by default we only drop messages from senders that aren't phone numbers, ie: short codes and
+# alphanumeric senders, the same ones our spam app ignores
+DEFAULT_RULES = (('not-a-phone', 'invalid', None),)
+
+class Prefilter(object):
+    """
+    A cheap set of rules incoming messages are checked against before they are written to the
+    database.  Each rule is a tuple of (name, kind, value), kind being one of:
+
+           invalid    - the sender isn't a valid phone number, value is ignored
+           identity   - the raw sender matches the regular expression in value
+           blocklist  - the sender is one of the phone numbers in value
+           text       - the text of the message matches the regular expression in value
+
+    In 'drop' mode messages matching a rule are dropped, in 'count' mode they are let through
+    and only counted, which lets you see what new rules would catch before turning them on.
+    Either way we keep count of the hits for each rule.
+    """
+    def __init__(self, rules=DEFAULT_RULES, mode='drop'):
+        if not mode in ('drop', 'count'):
+            raise ValueError("Unknown prefilter mode '%s', must be 'drop' or 'count'" % mode)
+
+        self.mode = mode
+        self.rules = []
+        self.hits = dict()
+
+        for (name, kind, value) in rules:
+            if kind in ('identity', 'text'):
+                value = re.compile(value, re.UNICODE)
+            elif kind == 'blocklist':
+                value = set([normalize_identity(identity) or identity for identity in value])
+            elif kind != 'invalid':
+                raise ValueError("Unknown prefilter rule kind '%s' for rule '%s'" % (kind, name))
+
+            self.rules.append((name, kind, value))
+            self.hits[name] = 0
+
+    def match(self, sender, text):
+        """
+        Returns the name of the first rule the passed in sender and text match, or None
+        """
+        normalized = None
+
+        for (name, kind, value) in self.rules:
+            if kind == 'invalid' or kind == 'blocklist':
+                if normalized is None:
+                    normalized = normalize_identity(sender) or ''
+
+                if kind == 'invalid':
+                    matched = not normalized
+                else:
+                    matched = (normalized or sender) in value
+
+            elif kind == 'identity':
+                matched = value.search(sender)
+            else:
+                matched = value.search(text or '')
+
+            if matched:
+                self.hits[name] += 1
+                return name
+
+        return None
+
+    def drop(self, sender, text):
+        """
+        Returns whether the message with the passed in sender and text should be dropped
+        """
+        return self.match(sender, text) is not None and self.mode == 'drop'
+
+PREFILTER = None
+
+def get_prefilter():
+    """
+    Returns our shared prefilter, configured using SPAM_PREFILTER_RULES and SPAM_PREFILTER_MODE
+    """
+    global PREFILTER
+    if PREFILTER is None:
+        PREFILTER = Prefilter(getattr(settings, 'SPAM_PREFILTER_RULES', DEFAULT_RULES),
+                              getattr(settings, 'SPAM_PREFILTER_MODE', 'drop'))
+
+    return PREFILTER
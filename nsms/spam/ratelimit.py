@@ -0,0 +1,115 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from nsms.lru import LRUCache
+
+ACTIONS = ('drop', 'notice', 'defer')
+
+class RateLimiter(object):
+    """
+    Limits how many messages each sender can send using a token bucket per sender.  Buckets hold
+    up to burst tokens and refill at per_minute tokens a minute, every message using up a token.
+
+    Tokens can also be reserved for messages handled later, each waiting behind the previous one.
+    A sender can only run up as many reserved tokens as their bucket holds.
+
+    Buckets are kept in a bounded in-process LRU, or in our Django cache when shared is set so
+    that all our workers see the same buckets.  Shared buckets are read and written without
+    locking, so a sender can sneak a few extra messages in when hitting several workers at once.
+    """
+    def __init__(self, per_minute=30, burst=30, action='drop', shared=False, max_size=10000):
+        if not action in ACTIONS:
+            raise ValueError("Unknown rate limit action '%s', must be one of %s" % (action, ", ".join(ACTIONS)))
+
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.action = action
+        self.shared = shared
+        self.buckets = LRUCache(max_size)
+
+        # how long a bucket takes to fill up again from as many tokens reserved as it holds, after
+        # which we don't need to remember it
+        self.timeout = int(2 * burst / self.rate) + 1
+
+    def get_bucket(self, key):
+        if self.shared:
+            return cache.get("nsms_rate_%s" % key)
+        return self.buckets.get(key)
+
+    def set_bucket(self, key, bucket):
+        if self.shared:
+            cache.set("nsms_rate_%s" % key, bucket, self.timeout)
+        else:
+            self.buckets.set(key, bucket)
+
+    def get_tokens(self, key, now):
+        """
+        Returns a tuple of the (tokens, limited) of the bucket for the passed in key
+        """
+        bucket = self.get_bucket(key)
+        if bucket is None:
+            return (self.burst, False)
+
+        (tokens, updated, limited) = bucket
+        return (min(self.burst, tokens + (now - updated) * self.rate), limited)
+
+    def consume(self, key, now=None):
+        """
+        Takes a token from the bucket for the passed in key.  Returns a tuple of (allowed, first),
+        first being True if this is the first message refused since the sender was last allowed
+        one, so that we only tell them they are being limited once.
+        """
+        if now is None:
+            now = time.time()
+
+        (tokens, limited) = self.get_tokens(key, now)
+
+        if tokens >= 1:
+            self.set_bucket(key, (tokens - 1, now, False))
+            return (True, False)
+
+        self.set_bucket(key, (tokens, now, True))
+        return (False, not limited)
+
+    def reserve(self, key, now=None):
+        """
+        Takes a token from the bucket for the passed in key ahead of time, for a message we will
+        handle later.  Returns how many seconds until that token is there, or None if the sender
+        already has a full bucket of tokens reserved, in which case nothing is reserved.
+        """
+        if now is None:
+            now = time.time()
+
+        (tokens, limited) = self.get_tokens(key, now)
+        wait = max(0, (1 - tokens) / self.rate)
+        if wait > self.burst / self.rate:
+            return None
+
+        self.set_bucket(key, (tokens - 1, now, limited))
+        return wait
+
+    def get_wait(self, key, now=None):
+        """
+        Returns how many seconds until the bucket for the passed in key has a token again
+        """
+        if now is None:
+            now = time.time()
+
+        (tokens, limited) = self.get_tokens(key, now)
+        return max(0, (1 - tokens) / self.rate)
+
+LIMITER = None
+
+def get_limiter():
+    """
+    Returns our shared rate limiter configured by SPAM_RATE_LIMIT, or None if rate limiting is off
+    """
+    global LIMITER
+    config = getattr(settings, 'SPAM_RATE_LIMIT', None)
+    if not config:
+        return None
+
+    if LIMITER is None:
+        LIMITER = RateLimiter(**config)
+
+    return LIMITER
@@ -0,0 +1,13 @@
+from celery.task import task
+
+@task
+def handle_deferred(message_id, text):
+    """
+    Hands a message we deferred because its sender was over their rate limit back to our apps,
+    with the passed in text as it may have been reassembled from several parts
+    """
+    from rapidsms_httprouter.models import Message
+    from nsms.utils import handle_message
+
+    db_message = Message.objects.get(pk=message_id)
+    handle_message(db_message, text, replayed='deferred')
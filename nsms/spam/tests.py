@@ -0,0 +1,147 @@
+from django.test import TestCase
+from .prefilter import Prefilter
+from .ratelimit import RateLimiter
+from .duplicates import DuplicateDetector, get_message_key
+
+class PrefilterTest(TestCase):
+
+    def test_rules(self):
+        prefilter = Prefilter((('not-a-phone', 'invalid', None),
+                               ('blocked', 'blocklist', ['+250 788 383 381']),
+                               ('tester', 'identity', r'^\+?25078800'),
+                               ('promo', 'text', r'(?i)win a prize')))
+
+        self.assertEquals('not-a-phone', prefilter.match("MTN", "hello"))
+        self.assertEquals('not-a-phone', prefilter.match("8080", "hello"))
+
+        # blocked numbers are matched whatever their format
+        self.assertEquals('blocked', prefilter.match("+250788383381", "hello"))
+        self.assertEquals('blocked', prefilter.match("250788383381", "hello"))
+
+        self.assertEquals('tester', prefilter.match("+250788001122", "hello"))
+        self.assertEquals('promo', prefilter.match("+250788112233", "WIN A PRIZE today"))
+        self.assertEquals(None, prefilter.match("+250788112233", "hello"))
+        self.assertEquals(None, prefilter.match("+250788112233", None))
+
+        # the first matching rule wins
+        self.assertEquals('blocked', prefilter.match("250788383381", "win a prize"))
+
+    def test_hits(self):
+        prefilter = Prefilter((('not-a-phone', 'invalid', None),
+                               ('promo', 'text', r'win a prize')))
+        self.assertEquals({'not-a-phone': 0, 'promo': 0}, prefilter.hits)
+
+        prefilter.match("MTN", "hello")
+        prefilter.match("MTN", "win a prize")
+        prefilter.match("+250788112233", "win a prize")
+        prefilter.match("+250788112233", "hello")
+
+        self.assertEquals({'not-a-phone': 2, 'promo': 1}, prefilter.hits)
+
+    def test_modes(self):
+        prefilter = Prefilter(mode='drop')
+        self.assertTrue(prefilter.drop("MTN", "hello"))
+        self.assertFalse(prefilter.drop("+250788112233", "hello"))
+
+        # in count mode nothing is dropped, but we still count what would have been
+        prefilter = Prefilter(mode='count')
+        self.assertFalse(prefilter.drop("MTN", "hello"))
+        self.assertEquals(1, prefilter.hits['not-a-phone'])
+
+    def test_invalid_config(self):
+        self.assertRaises(ValueError, Prefilter, mode='log')
+        self.assertRaises(ValueError, Prefilter, (('foo', 'sender', None),))
+
+class RateLimiterTest(TestCase):
+
+    def test_refill(self):
+        # a token a second, two at most
+        limiter = RateLimiter(per_minute=60, burst=2)
+
+        self.assertEquals((True, False), limiter.consume('a', 0))
+        self.assertEquals((True, False), limiter.consume('a', 0))
+        self.assertEquals((False, True), limiter.consume('a', 0))
+
+        # other senders have their own bucket
+        self.assertEquals((True, False), limiter.consume('b', 0))
+
+        # half a token isn't enough, a whole one is
+        self.assertEquals((False, False), limiter.consume('a', 0.5))
+        self.assertEquals((True, False), limiter.consume('a', 1))
+
+        # buckets never hold more than burst tokens
+        self.assertEquals((True, False), limiter.consume('a', 100))
+        self.assertEquals((True, False), limiter.consume('a', 100))
+        self.assertEquals((False, True), limiter.consume('a', 100))
+
+    def test_first_notice(self):
+        limiter = RateLimiter(per_minute=60, burst=1)
+
+        self.assertEquals((True, False), limiter.consume('a', 0))
+        self.assertEquals((False, True), limiter.consume('a', 0))
+        self.assertEquals((False, False), limiter.consume('a', 0.1))
+        self.assertEquals((False, False), limiter.consume('a', 0.2))
+
+        # once they are let through again, the next refusal is a first one again
+        self.assertEquals((True, False), limiter.consume('a', 1.2))
+        self.assertEquals((False, True), limiter.consume('a', 1.3))
+
+    def test_wait(self):
+        limiter = RateLimiter(per_minute=30, burst=1)
+        self.assertEquals(0, limiter.get_wait('a', 0))
+
+        limiter.consume('a', 0)
+        self.assertEquals(2, limiter.get_wait('a', 0))
+        self.assertEquals(1, limiter.get_wait('a', 1))
+        self.assertEquals(0, limiter.get_wait('a', 3))
+
+    def test_reserve(self):
+        limiter = RateLimiter(per_minute=60, burst=2)
+        limiter.consume('a', 0)
+        limiter.consume('a', 0)
+
+        # each reservation waits behind the last one
+        self.assertEquals(1, limiter.reserve('a', 0))
+        self.assertEquals(2, limiter.reserve('a', 0))
+
+        # a full bucket is reserved, we don't take any more
+        self.assertEquals(None, limiter.reserve('a', 0))
+
+        # and the sender waits for their reservations too
+        self.assertEquals((False, True), limiter.consume('a', 2))
+        self.assertEquals((True, False), limiter.consume('a', 3))
+
+    def test_invalid_action(self):
+        self.assertRaises(ValueError, RateLimiter, action='bounce')
+
+class DuplicateDetectorTest(TestCase):
+
+    def test_window(self):
+        detector = DuplicateDetector(window=60)
+
+        self.assertFalse(detector.is_duplicate('a', 0))
+        self.assertTrue(detector.is_duplicate('a', 30))
+        self.assertTrue(detector.is_duplicate('a', 59))
+        self.assertFalse(detector.is_duplicate('b', 30))
+
+        # copies don't extend the window, once it is over the message gets through again
+        self.assertFalse(detector.is_duplicate('a', 60))
+        self.assertTrue(detector.is_duplicate('a', 100))
+
+        self.assertEquals(3, detector.duplicates)
+
+    def test_forget(self):
+        detector = DuplicateDetector(window=60)
+        detector.is_duplicate('a', 0)
+        detector.forget('a')
+        self.assertFalse(detector.is_duplicate('a', 1))
+
+    def test_message_key(self):
+        key = get_message_key('console', '250788383381', u"reg bach")
+        self.assertEquals(key, get_message_key('console', '250788383381', u"reg bach"))
+        self.assertNotEquals(key, get_message_key('console', '250788383381', u"reg bach2"))
+        self.assertNotEquals(key, get_message_key('console', '250788383382', u"reg bach"))
+        self.assertNotEquals(key, get_message_key('mtn', '250788383381', u"reg bach"))
+
+        # unicode messages are fine too
+        get_message_key('console', '250788383381', u"r\u00e9g")
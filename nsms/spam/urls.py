@@ -0,0 +1,7 @@
+from django.conf.urls.defaults import *
+from .views import receive
+
+# include these before rapidsms_httprouter.urls so our receive view comes first
+urlpatterns = patterns("",
+    ("^router/receive", receive),
+)
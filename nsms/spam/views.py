@@ -0,0 +1,22 @@
+from django.http import HttpResponse
+from rapidsms_httprouter import views
+from nsms.utils import get_connection_identity
+from .prefilter import get_prefilter
+
+def receive(request):
+    """
+    Runs incoming messages through our prefilter before handing them to the router, so that
+    dropped messages never create a connection or a message in the database.
+
+    Senders are then resolved to the identity of their existing connection, or normalized for
+    new senders, so the same phone always ends up with the same connection.
+    """
+    sender = request.GET.get('sender', '')
+    if get_prefilter().drop(sender, request.GET.get('message', '')):
+        return HttpResponse("Message filtered.")
+
+    if sender and request.GET.get('backend'):
+        request.GET = request.GET.copy()
+        request.GET['sender'] = get_connection_identity(request.GET['backend'], sender)
+
+    return views.receive(request)
@@ -1,12 +1,10 @@
-from django.contrib.auth.models import User
-from django.template.base import Template
-from django.template.context import Context
-from nsms.text.models import Text
+from nsms.text.catalog import CATALOG, DEFAULTS, register
+from nsms.text.render import render_text
 
 class LazyText(object):
     
-    def __init__(self, text, variables):
-        self.text = text
+    def __init__(self, slug, variables):
+        self.slug = slug
         self.variables = variables
 
     def __mod__(self, b):
@@ -19,31 +17,30 @@ class LazyText(object):
         return str(unicode(self))
 
     def __unicode__(self):
-        # get the actual string from our Text object, at this point the currently
+        # get the actual string from our catalog, at this point the currently
         # activated language will be used to get the string
-        text = self.text.text
+        try:
+            (key, text) = CATALOG.resolve(self.slug)
+        except Exception as e:
+            # we can't get at our catalog, use the default string
+            (key, text) = ((self.slug, None, 'default'), DEFAULTS.get(self.slug, self.slug))
 
         if self.variables is None:
             return unicode(text)
         else:
             try:
                 # our text is a template, perform substitutions on it
-                template = Template("%s" % text)
-                return template.render(Context(self.variables))
+                return render_text(key, "%s" % text, self.variables)
             except Exception as e:
                 # if we throw an error, display the raw template
                 return text
 
 def gettext(slug, default_string, variables=None):
-    text = Text.objects.filter(slug=slug)
-
-    if text:
-        text = text[0]
-    else:
-        text = Text.objects.create(slug=slug,
-                                   text=default_string,
-                                   created_by=User.objects.get(id=-1),
-                                   modified_by=User.objects.get(id=-1))
-
-    return LazyText(text, variables)
-
+    """
+    Returns the text with the passed in slug, rendered with the passed in variables.  This
+    does no database work, the default string is registered and the Text for it is created
+    when the catalog is next synchronized, ie: when the text is first rendered or when the
+    sync_texts management command is run.
+    """
+    register(slug, default_string)
+    return LazyText(slug, variables)
@@ -0,0 +1,315 @@
+import time
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.utils import translation
+from nsms.text.models import Text
+from nsms.text.files import get_catalog_files, get_catalog_state, get_catalog_version, get_language_code
+from nsms.text.files import export_catalogs
+
+# the generation counter and list of recent (generation, slug) changes we share through our cache
+GENERATION_KEY = 'nsms_text_generation'
+CHANGES_KEY = 'nsms_text_changes'
+CHANGES_TIMEOUT = 60 * 60 * 24 * 30
+MAX_CHANGES = 100
+
+# the default strings our apps use, keyed by slug, registered as they are imported
+DEFAULTS = dict()
+
+def register(slug, default_string):
+    """
+    Registers the default string for the passed in slug, it will be created the next time
+    the catalog is synchronized if there is no Text with that slug yet.
+    """
+    if not slug in DEFAULTS:
+        DEFAULTS[slug] = default_string
+
+class TextCatalog(object):
+    """
+    A per-process cache of all our Text strings, keyed by slug and then by language.
+
+    The catalog is loaded in a single query the first time it is used, and reloaded after
+    invalidate() is called, which our TextCRUDL.Update view does whenever a Text is saved.
+    Like modeltranslation, a language without a translation falls back to the text column.
+    Keeps count of hits and misses so we can see how often we still go to the database.
+
+    Every string we add gets a new revision, so anything derived from it, like compiled
+    templates, can be cached by slug, language and revision.
+
+    If TEXT_CATALOG_DIR is set, the catalog files exported there are looked at first and we
+    only load from the database for strings they don't have.  Files are only used while their
+    version matches our Text rows.  When we see our rows change and the files don't match them,
+    we export them again, so hosts which don't share TEXT_CATALOG_DIR catch up too.
+
+    At most every TEXT_INVALIDATION_INTERVAL seconds we look for strings edited in other
+    processes.  With a cache backend shared by all your workers, edits are announced through
+    a generation counter kept in it and only the slugs that changed are evicted.  Whatever the
+    cache, we also compare the latest modified_on and count of our Text rows to what we loaded,
+    and read the rows modified since, so edits are picked up with a per-process cache too.
+    """
+    def __init__(self):
+        self.texts = None
+        self.generation = None
+        self.state = None
+        self.version = None
+        self.checked = 0
+        self.files = None
+        self.files_checked = False
+        self.revision = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def load(self):
+        """
+        Loads every Text row, with all its translated columns, into our catalog, creating the
+        ones for any registered default string we don't have yet.  Returns the list of slugs
+        that were created.
+        """
+        # read the generation and state first, so changes made while we load are picked up next check
+        self.generation = cache.get(GENERATION_KEY, 0)
+        self.set_state(get_catalog_state())
+        self.checked = time.time()
+
+        self.texts = dict()
+        for row in Text.objects.values():
+            self.add(row)
+
+        self.loads += 1
+        return self.sync()
+
+    def sync(self, slugs=None):
+        """
+        Reads the Text rows for the passed in slugs that aren't in our catalog, or for all the
+        registered ones if no slugs are passed in, in a single query.  The registered ones that
+        don't exist yet are then created using a single insert, or one by one if another process
+        beat us to some of them.  Returns the list of slugs that were created.
+        """
+        if self.texts is None:
+            self.load()
+
+        if slugs is None:
+            slugs = DEFAULTS.keys()
+
+        missing = [slug for slug in slugs if not slug in self.texts]
+        if not missing:
+            return []
+
+        for row in Text.objects.filter(slug__in=missing).values():
+            self.add(row)
+
+        missing = [slug for slug in missing if slug in DEFAULTS and not slug in self.texts]
+        if not missing:
+            return []
+
+        user = User.objects.get(id=-1)
+        savepoint = transaction.savepoint()
+        try:
+            Text.objects.bulk_create([Text(slug=slug, text=DEFAULTS[slug], created_by=user, modified_by=user)
+                                      for slug in missing])
+            transaction.savepoint_commit(savepoint)
+
+        # another process created some of them first, read theirs
+        except IntegrityError:
+            transaction.savepoint_rollback(savepoint)
+            for row in Text.objects.filter(slug__in=missing).values():
+                self.add(row)
+
+            created = []
+            for slug in missing:
+                if not slug in self.texts:
+                    (row, was_created) = Text.objects.get_or_create(slug=slug,
+                                                                    defaults=dict(text=DEFAULTS[slug], created_by=user,
+                                                                                  modified_by=user))
+                    self.add(dict(slug=slug, text=row.text))
+                    if was_created:
+                        created.append(slug)
+
+            return self.count_created(created)
+
+        for slug in missing:
+            self.add(dict(slug=slug, text=DEFAULTS[slug]))
+
+        return self.count_created(missing)
+
+    def count_created(self, slugs):
+        """
+        Adds the rows we just created to the state we loaded, as we already have them, so that
+        our next check doesn't mistake them for rows added elsewhere and reload everything.
+        """
+        if slugs and self.state is not None:
+            self.set_state((self.state[0], self.state[1] + len(slugs)))
+
+        return slugs
+
+    def add(self, row):
+        """
+        Adds a Text to our catalog, row being a dict of its column values
+        """
+        if self.texts is None:
+            self.load()
+
+        translations = dict()
+        for (field, value) in row.items():
+            if field.startswith('text_') and value:
+                translations[field[5:]] = value
+
+        self.revision += 1
+        self.texts[row['slug']] = (row['text'], translations, self.revision)
+
+    def invalidate(self):
+        """
+        Throws away everything we have cached, the next lookup reloads the catalog
+        """
+        self.texts = None
+
+    def evict(self, slug):
+        """
+        Throws away the passed in slug, the next lookup for it reads it again
+        """
+        if self.texts is not None:
+            self.texts.pop(slug, None)
+
+    def changed(self, slug):
+        """
+        Called when the Text with the passed in slug has been edited, evicts it here and lets
+        our other processes know they need to do the same.
+        """
+        self.evict(slug)
+
+        cache.add(GENERATION_KEY, 0, CHANGES_TIMEOUT)
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            # our counter expired between add and incr, start it over
+            generation = 1
+            cache.set(GENERATION_KEY, generation, CHANGES_TIMEOUT)
+
+        changes = cache.get(CHANGES_KEY) or []
+        changes = (changes + [(generation, slug)])[-MAX_CHANGES:]
+        cache.set(CHANGES_KEY, changes, CHANGES_TIMEOUT)
+
+    def check(self):
+        """
+        Picks up the strings other processes have changed since we last checked, at most every
+        TEXT_INVALIDATION_INTERVAL seconds
+        """
+        now = time.time()
+        if now < self.checked + getattr(settings, 'TEXT_INVALIDATION_INTERVAL', 5):
+            return
+
+        self.checked = now
+        self.check_generation()
+        self.check_state()
+
+    def check_generation(self):
+        """
+        Evicts the slugs announced as changed in our cache since our generation
+        """
+        if self.texts is None:
+            return
+
+        generation = cache.get(GENERATION_KEY, 0)
+        if generation == self.generation:
+            return
+
+        # we need every generation since ours, if our counter went backwards or any change is
+        # missing from the list, ie: two saves raced to append to it, start over
+        changes = [(changed, slug) for (changed, slug) in cache.get(CHANGES_KEY) or [] if changed > self.generation]
+        generations = set([changed for (changed, slug) in changes])
+        if generation < self.generation or generations != set(range(self.generation + 1, generation + 1)):
+            self.invalidate()
+            return
+
+        for (changed, slug) in changes:
+            self.evict(slug)
+
+        self.generation = generation
+
+    def check_state(self):
+        """
+        Reads the rows modified since the state we loaded, this only needs our database, so
+        also works when our cache isn't shared between processes.
+        """
+        state = get_catalog_state()
+        if state == self.state:
+            return
+
+        if self.texts is not None:
+            (latest, count) = self.state
+
+            # rows were added or removed, start over
+            if latest is None or count != state[1]:
+                self.invalidate()
+            else:
+                for row in Text.objects.filter(modified_on__gte=latest).values():
+                    self.add(row)
+
+        self.set_state(state)
+
+        # our files were exported somewhere else or before the change, bring them up to date
+        if self.files and self.files.read_version() != self.version:
+            export_catalogs(self.files.directory)
+            self.files.checked = 0
+
+    def set_state(self, state):
+        self.state = state
+        self.version = get_catalog_version(state)
+
+    def __contains__(self, slug):
+        if self.texts is None:
+            self.load()
+
+        return slug in self.texts
+
+    def get(self, slug, language=None):
+        """
+        Returns the string for the passed in slug in the passed in language, or in the currently
+        active language if none is passed in.  Returns None if we have no such slug.
+        """
+        return self.resolve(slug, language)[1]
+
+    def resolve(self, slug, language=None):
+        """
+        Returns a tuple of (key, text) for the passed in slug and language, key being the
+        (slug, language, revision) the text can be cached by.  The text is None if we have no
+        such slug.
+        """
+        if language is None:
+            language = translation.get_language()
+
+        language = get_language_code(language)
+
+        if not self.files_checked:
+            self.files = get_catalog_files()
+            self.files_checked = True
+
+        self.check()
+
+        # our exported files come first, as long as they are current
+        if self.files:
+            text = self.files.get(slug, language)
+            if text is not None and self.files.version == self.version:
+                self.hits += 1
+                return ((slug, language, 'file-%s' % self.files.version), text)
+
+        if self.texts is None:
+            self.load()
+
+        if slug in self.texts:
+            self.hits += 1
+
+        # registered since we last synchronized, create it
+        else:
+            self.misses += 1
+            self.sync([slug])
+
+        if not slug in self.texts:
+            return ((slug, language, None), None)
+
+        (text, translations, revision) = self.texts[slug]
+        return ((slug, language, revision), translations.get(language, text))
+
+# our shared catalog
+CATALOG = TextCatalog()
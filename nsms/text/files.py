@@ -0,0 +1,146 @@
+import os
+import json
+import time
+from django.conf import settings
+from django.db.models import Max, Count
+from nsms.text.models import Text
+
+# the file holding the version of the catalog files currently exported
+VERSION_FILE = 'VERSION'
+
+def get_language_code(language):
+    """
+    Returns the passed in language the way modeltranslation names its columns, ie: en_us for en-us
+    """
+    return (language or '').replace('-', '_').lower()
+
+def get_catalog_filename(directory, language):
+    return os.path.join(directory, "texts.%s.json" % get_language_code(language))
+
+def get_catalog_state():
+    """
+    Returns a tuple of (latest modified_on, count) for our Text rows, which changes whenever
+    one is edited, added or removed.
+    """
+    state = Text.objects.aggregate(latest=Max('modified_on'), count=Count('id'))
+    return (state['latest'], state['count'])
+
+def get_catalog_version(state):
+    """
+    Returns the version for the passed in catalog state, which our catalog files are stamped with
+    """
+    (latest, count) = state
+    if latest is None:
+        return "0"
+
+    return "%d-%s" % (count, latest.strftime('%Y%m%d%H%M%S%f'))
+
+def write_file(filename, content):
+    # write to a temporary file and rename it, so workers never read a partial file, each
+    # process uses its own as several workers can export at once
+    tmp = "%s.%d.tmp" % (filename, os.getpid())
+    out = open(tmp, 'w')
+    try:
+        out.write(content)
+    finally:
+        out.close()
+
+    os.rename(tmp, filename)
+
+def export_catalogs(directory):
+    """
+    Writes a catalog file for each of our LANGUAGES to the passed in directory, each being a
+    JSON dict of slug to text, then stamps them with the version of the rows they contain, so
+    workers can tell whether they are still current.  Returns the version.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    # read the version first, if a row changes while we export the files just look stale
+    version = get_catalog_version(get_catalog_state())
+    rows = list(Text.objects.values())
+
+    for (code, name) in getattr(settings, 'LANGUAGES', ()):
+        column = "text_%s" % get_language_code(code)
+
+        texts = dict()
+        for row in rows:
+            texts[row['slug']] = row.get(column) or row['text']
+
+        write_file(get_catalog_filename(directory, code),
+                   json.dumps(dict(version=version, texts=texts), separators=(',', ':')))
+
+    # the version is written last, workers reload once they see it change
+    write_file(os.path.join(directory, VERSION_FILE), version)
+    return version
+
+class CatalogFiles(object):
+    """
+    The catalog files exported by export_catalogs, loaded lazily per language.  We check the
+    version stamp at most every check_interval seconds and throw away everything we've loaded
+    when it changes, so edits are picked up without restarting our workers.
+    """
+    def __init__(self, directory, check_interval=5):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.checked = 0
+        self.version = None
+        self.languages = dict()
+
+    def refresh(self):
+        now = time.time()
+        if now < self.checked + self.check_interval:
+            return
+
+        self.checked = now
+
+        version = self.read_version()
+        if version != self.version:
+            self.version = version
+            self.languages = dict()
+
+    def read_version(self):
+        """
+        Returns the version of the files currently exported, None if there are none
+        """
+        try:
+            stamp = open(os.path.join(self.directory, VERSION_FILE))
+            try:
+                return stamp.read().strip()
+            finally:
+                stamp.close()
+        except IOError:
+            return None
+
+    def load(self, language):
+        try:
+            catalog = open(get_catalog_filename(self.directory, language))
+            try:
+                return json.load(catalog)['texts']
+            finally:
+                catalog.close()
+        except:
+            return dict()
+
+    def get(self, slug, language):
+        """
+        Returns the text for the passed in slug and language, or None if our files don't have it
+        """
+        self.refresh()
+        if self.version is None:
+            return None
+
+        if not language in self.languages:
+            self.languages[language] = self.load(language)
+
+        return self.languages[language].get(slug)
+
+def get_catalog_files():
+    """
+    Returns our CatalogFiles if TEXT_CATALOG_DIR is configured, None otherwise
+    """
+    directory = getattr(settings, 'TEXT_CATALOG_DIR', None)
+    if not directory:
+        return None
+
+    return CatalogFiles(directory, getattr(settings, 'TEXT_CATALOG_CHECK_INTERVAL', 5))
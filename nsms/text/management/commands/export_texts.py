@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from nsms.text.files import export_catalogs
+
+class Command(BaseCommand):
+    args = "[directory]"
+    help = "Exports all our Text strings to per language catalog files, TEXT_CATALOG_DIR by default"
+
+    def handle(self, *args, **options):
+        if args:
+            directory = args[0]
+        else:
+            directory = getattr(settings, 'TEXT_CATALOG_DIR', None)
+
+        if not directory:
+            raise CommandError("No directory passed in and TEXT_CATALOG_DIR is not set")
+
+        version = export_catalogs(directory)
+        self.stdout.write("Exported catalogs to %s, version %s\n" % (directory, version))
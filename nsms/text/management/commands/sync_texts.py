@@ -0,0 +1,22 @@
+from django.core.management.base import NoArgsCommand
+from django.conf import settings
+from django.utils.importlib import import_module
+from nsms.text.catalog import CATALOG, DEFAULTS
+
+class Command(NoArgsCommand):
+    help = "Creates the Text rows for all the default strings registered by our SMS apps"
+
+    def handle_noargs(self, **options):
+        # importing our apps registers their default strings
+        for app in getattr(settings, 'SMS_APPS', []):
+            try:
+                import_module("%s.app" % app)
+            except ImportError:
+                pass
+
+        created = CATALOG.load()
+
+        for slug in sorted(created):
+            self.stdout.write("Created %s\n" % slug)
+
+        self.stdout.write("%d strings registered, %d created\n" % (len(DEFAULTS), len(created)))
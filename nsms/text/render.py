@@ -0,0 +1,68 @@
+import re
+from django.template.base import Template
+from django.template.context import Context
+from django.utils.encoding import force_unicode
+from django.utils.formats import localize
+from django.utils.html import conditional_escape
+from nsms.lru import LRUCache
+
+# a plain {{ variable }}, no filters or lookups
+VARIABLE_REGEX = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+# anything else that needs the template engine
+TEMPLATE_TAG_REGEX = re.compile(r'\{[\{%#]')
+
+# compiled templates, keyed by (slug, language, revision)
+TEMPLATES = LRUCache(1000)
+
+class SimpleTemplate(object):
+    """
+    A template made only of text and plain {{ variable }} substitutions, which we render
+    ourselves the same way Django would, localizing and escaping the values, but without
+    going through the template engine.
+    """
+    def __init__(self, text):
+        self.parts = VARIABLE_REGEX.split(text)
+
+    def render(self, variables):
+        output = []
+        for (index, part) in enumerate(self.parts):
+            # odd parts are our variable names
+            if index % 2:
+                value = variables.get(part, '')
+                output.append(conditional_escape(force_unicode(localize(value))))
+            else:
+                output.append(part)
+
+        return u"".join(output)
+
+class DjangoTemplate(object):
+    """
+    Any other template, rendered by Django
+    """
+    def __init__(self, text):
+        self.template = Template(text)
+
+    def render(self, variables):
+        return self.template.render(Context(variables))
+
+def compile_text(text):
+    """
+    Returns the template for the passed in text, a SimpleTemplate if it can be
+    """
+    if TEMPLATE_TAG_REGEX.search(VARIABLE_REGEX.sub('', text)):
+        return DjangoTemplate(text)
+
+    return SimpleTemplate(text)
+
+def render_text(key, text, variables):
+    """
+    Renders the passed in text with the passed in variables, compiling its template only
+    if we don't already have one for the passed in key.
+    """
+    template = TEMPLATES.get(key)
+    if template is None:
+        template = compile_text(text)
+        TEMPLATES.set(key, template)
+
+    return template.render(variables)
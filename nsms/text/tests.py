@@ -1,3 +1,165 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import translation
+from django.utils.safestring import mark_safe
+from .render import SimpleTemplate, DjangoTemplate, compile_text
+from .catalog import TextCatalog, GENERATION_KEY, CHANGES_KEY, register
+from .files import CatalogFiles, export_catalogs
+from .models import Text
+import datetime
+import tempfile
+import shutil
+import time
 
-        
+class RenderTest(TestCase):
+
+    def assertSameRender(self, text, variables):
+        # our simple templates have to render exactly like Django does
+        rendered = SimpleTemplate(text).render(variables)
+        self.assertEquals(DjangoTemplate(text).render(variables), rendered)
+        return rendered
+
+    def test_escaping(self):
+        rendered = self.assertSameRender("Hello {{ name }}", dict(name="Bob's & <Alice>"))
+        self.assertTrue("&amp;" in rendered)
+        self.assertFalse("'" in rendered)
+        self.assertFalse("<" in rendered)
+
+        # safe strings are left alone
+        self.assertEquals(u"Hello <b>Bob</b>", self.assertSameRender("Hello {{ name }}", dict(name=mark_safe("<b>Bob</b>"))))
+        self.assertSameRender("Hello {{ name }}", dict(name=u"Am\u00e9lie"))
+
+    def test_numbers(self):
+        text = "You have {{count}} points, {{ average }} on average, since {{ since }}"
+        variables = dict(count=1234567, average=1234.5, since=datetime.date(2012, 3, 4))
+        self.assertSameRender(text, variables)
+
+        with self.settings(USE_L10N=True, USE_THOUSAND_SEPARATOR=True):
+            with translation.override('fr'):
+                rendered = self.assertSameRender(text, variables)
+                self.assertTrue("1234,5" in rendered.replace(u"\xa0", "").replace(" ", ""))
+
+    def test_missing_and_none(self):
+        self.assertEquals(u"Hello !", self.assertSameRender("Hello {{ name }}!", dict()))
+        self.assertSameRender("Hello {{ name }}!", dict(name=None))
+        self.assertSameRender("Hello {{ name }}!", dict(name=0))
+        self.assertSameRender("Hello {{ name }}!", dict(name=True))
+        self.assertEquals(u"No variables", self.assertSameRender("No variables", dict(name="Bob")))
+
+    def test_compile(self):
+        self.assertTrue(isinstance(compile_text("Hello"), SimpleTemplate))
+        self.assertTrue(isinstance(compile_text("Hello {{ name }}, {{age}}"), SimpleTemplate))
+
+        # filters, lookups, tags and comments need Django
+        self.assertTrue(isinstance(compile_text("Hello {{ name|upper }}"), DjangoTemplate))
+        self.assertTrue(isinstance(compile_text("Hello {{ user.name }}"), DjangoTemplate))
+        self.assertTrue(isinstance(compile_text("{% if name %}Hello{% endif %}"), DjangoTemplate))
+        self.assertTrue(isinstance(compile_text("Hello {# nobody #}"), DjangoTemplate))
+
+        self.assertEquals(u"Hello BOB", compile_text("Hello {{ name|upper }}").render(dict(name="bob")))
+        self.assertEquals(u"Hello", compile_text("{% if name %}Hello{% endif %}").render(dict(name="bob")))
+
+class CatalogTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.get_or_create(id=-1, defaults=dict(username='AnonymousUser'))
+        self.user = User.objects.create_user('editor')
+        self.catalog = TextCatalog()
+
+    def create_text(self, slug, text):
+        return Text.objects.create(slug=slug, text=text, created_by=self.user, modified_by=self.user)
+
+    def test_generation_evicts_changed(self):
+        self.create_text('hello', "Hello")
+        self.create_text('bye', "Bye")
+        self.catalog.load()
+
+        self.catalog.generation = 1
+        cache.set(GENERATION_KEY, 3)
+        cache.set(CHANGES_KEY, [(1, 'bye'), (2, 'hello'), (3, 'hello')])
+
+        # only the slugs changed since our generation are evicted
+        self.catalog.check_generation()
+        self.assertFalse('hello' in self.catalog.texts)
+        self.assertTrue('bye' in self.catalog.texts)
+        self.assertEquals(3, self.catalog.generation)
+
+    def test_generation_gap(self):
+        self.create_text('hello', "Hello")
+        self.catalog.load()
+
+        # generation 2 never made it to the list, we can't tell what changed then
+        self.catalog.generation = 1
+        cache.set(GENERATION_KEY, 3)
+        cache.set(CHANGES_KEY, [(3, 'hello')])
+
+        self.catalog.check_generation()
+        self.assertEquals(None, self.catalog.texts)
+
+        # same thing if our counter goes backwards
+        self.catalog.load()
+        self.catalog.generation = 5
+        self.catalog.check_generation()
+        self.assertEquals(None, self.catalog.texts)
+
+    def test_state_changes(self):
+        hello = self.create_text('hello', "Hello")
+
+        # the defaults we create as we load don't count as changes
+        register('catalog-default', "Default")
+        self.assertEquals(['catalog-default'], self.catalog.load())
+        self.assertEquals("Hello", self.catalog.get('hello', 'en_us'))
+
+        # an edited row is read again, without reloading everything
+        time.sleep(0.01)
+        hello.text = "Hi"
+        hello.save()
+
+        self.catalog.check_state()
+        self.assertEquals("Hi", self.catalog.texts['hello'][0])
+        self.assertEquals(1, self.catalog.loads)
+
+        # a new row means we start over
+        self.create_text('bye', "Bye")
+        self.catalog.check_state()
+        self.assertEquals(None, self.catalog.texts)
+
+        self.assertEquals("Bye", self.catalog.get('bye', 'en_us'))
+        self.assertEquals(2, self.catalog.loads)
+
+    def test_stale_files(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with self.settings(LANGUAGES=(('en_us', "English"),)):
+                self.create_text('hello', "Hello")
+                version = export_catalogs(directory)
+
+                self.catalog.files = CatalogFiles(directory, 0)
+                self.catalog.files_checked = True
+                self.catalog.checked = time.time()
+
+                # files matching our rows are served
+                self.catalog.load()
+                self.assertEquals(version, self.catalog.version)
+                self.assertEquals((('hello', 'en_us', 'file-%s' % version), "Hello"), self.catalog.resolve('hello', 'en_us'))
+
+                # files which don't aren't
+                self.catalog.version = "stale"
+                (key, text) = self.catalog.resolve('hello', 'en_us')
+                self.assertEquals("Hello", text)
+                self.assertFalse(str(key[2]).startswith('file-'))
+
+                # and are exported again once we see our rows changed
+                Text.objects.filter(slug='hello').update(text="Hi")
+                time.sleep(0.01)
+                self.create_text('bye', "Bye")
+                self.catalog.checked = 0
+
+                (key, text) = self.catalog.resolve('hello', 'en_us')
+                self.assertEquals("Hi", text)
+                self.assertNotEquals(version, self.catalog.files.read_version())
+                self.assertEquals(self.catalog.version, self.catalog.files.read_version())
+        finally:
+            shutil.rmtree(directory)
@@ -1,5 +1,8 @@
 from smartmin.views import *
 from .models import *
+from .catalog import CATALOG
+from .files import export_catalogs
+from django.conf import settings
 from django import forms
 from django.template.base import Template
 
@@ -54,6 +57,19 @@ class TextCRUDL(SmartCRUDL):
 
             return initial
 
+        def post_save(self, obj):
+            obj = super(TextCRUDL.Update, self).post_save(obj)
+
+            # our cached string is now out of date, here and in our other processes
+            CATALOG.changed(obj.slug)
+
+            # as are our catalog files, regenerate them so workers reload them
+            directory = getattr(settings, 'TEXT_CATALOG_DIR', None)
+            if directory:
+                export_catalogs(directory)
+
+            return obj
+
     class List(SmartListView):
         default_order = ('slug')
         fields = ('slug', 'text')
@@ -1,7 +1,29 @@
 from django.contrib.auth.models import User, Group
 from django.conf import settings
-from rapidsms.models import Contact
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from rapidsms.models import Contact, Connection
+from nsms.parser import Parser
+from nsms.parser.phone import normalize_phone
+from nsms.lru import LRUCache
+from nsms.lang.languages import activate
 import sys
+import re
+import time
+
+# the characters the http router strips from senders before creating connections
+ROUTER_NUMBER_REGEX = re.compile('[^0-9a-z]')
+
+# marks values that aren't cached yet, as None is a valid value
+MISSING = object()
+
+# the name of the group all our SMS users belong to
+SMS_USERS_GROUP = "SMS Users"
+
+# our SMS_PROFILE classes, keyed by name, and the profiles we've looked up, keyed by connection id,
+# along with when they expire
+PROFILE_CLASSES = dict()
+PROFILES = LRUCache(10000)
 
 def import_from_string(kls):
     """
@@ -14,9 +36,109 @@ def import_from_string(kls):
         m = getattr(m, comp)            
     return m
 
+def normalize_identity(identity):
+    """
+    Returns the passed in identity as an E.164 phone number, without the leading '+', using the
+    DEFAULT_COUNTRY_CODE in settings.py for national numbers, which are kept as they are if it
+    isn't set.  Returns None for identities that aren't phone numbers, such as alphanumeric
+    senders and short codes.
+    """
+    return normalize_phone(identity, getattr(settings, 'DEFAULT_COUNTRY_CODE', None))
+
+def get_identities(identity):
+    """
+    Returns the normalized form of the passed in identity, and the set of all the forms a connection
+    for it may have been created under: normalized, raw, or cleaned the way the http router does it.
+    """
+    normalized = normalize_identity(identity) or identity
+    return (normalized, set([normalized, identity, ROUTER_NUMBER_REGEX.sub('', identity.lower())]))
+
+def find_connection_identity(backend, identity):
+    """
+    Returns the identity of the existing connection for the passed in backend (or backend name) and
+    identity, preferring the normalized one, or None if there is no such connection yet
+    """
+    (normalized, identities) = get_identities(identity)
+
+    if isinstance(backend, basestring):
+        connections = Connection.objects.filter(backend__name=backend, identity__in=identities)
+    else:
+        connections = Connection.objects.filter(backend=backend, identity__in=identities)
+
+    existing = list(connections.values_list('identity', flat=True))
+    if normalized in existing:
+        return normalized
+    elif existing:
+        return existing[0]
+
+    return None
+
+def get_connection_identity(backend, identity):
+    """
+    Returns the identity to hand the router for the passed in sender, the identity of its existing
+    connection if it has one, so that we don't create a second connection for a phone we already
+    know under another form, or the normalized identity for new senders.
+    """
+    return find_connection_identity(backend, identity) or normalize_identity(identity) or identity
+
+def get_connection(backend, identity):
+    """
+    Returns the connection for the passed in backend and identity, creating it if necessary.  Phone
+    numbers are normalized first, so the same phone always maps to the same connection whatever
+    format it was given in.  Existing connections using the raw identity are still found.
+    """
+    (connection, created) = Connection.objects.get_or_create(backend=backend,
+                                                             identity=get_connection_identity(backend, identity))
+    return connection
+
+def evict_profile(sender, instance, **kwargs):
+    """
+    Removes the passed in profile or connection from our profile cache when it is saved or deleted
+    """
+    if isinstance(instance, Connection):
+        PROFILES.delete(instance.id)
+
+    # profiles with a connection
+    elif getattr(instance, 'connection_id', None):
+        PROFILES.delete(instance.connection_id)
+
+    # RapidSMS contacts, which can have many connections, by the time a contact is deleted its
+    # connections no longer point to it, so we start over then
+    elif isinstance(instance, Contact) and kwargs.get('signal') is not post_delete:
+        for connection_id in Connection.objects.filter(contact=instance).values_list('id', flat=True):
+            PROFILES.delete(connection_id)
+
+    # we don't know what connections this profile belongs to, start over
+    else:
+        PROFILES.clear()
+
+def get_profile_class(profile_class_name):
+    """
+    Returns the class with the passed in name, resolving it only once and hooking up the signals
+    that keep our profile cache up to date.
+    """
+    profile_class = PROFILE_CLASSES.get(profile_class_name)
+    if profile_class is None:
+        profile_class = import_from_string(profile_class_name)
+
+        for signal in (post_save, post_delete):
+            signal.connect(evict_profile, sender=profile_class, weak=False,
+                           dispatch_uid="nsms_profile_%s" % profile_class_name)
+            signal.connect(evict_profile, sender=Connection, weak=False,
+                           dispatch_uid="nsms_profile_connection")
+
+        PROFILE_CLASSES[profile_class_name] = profile_class
+
+    return profile_class
+
 def get_sms_profile(connection):
     """
     Given a connection, looks up the SMS profile using the SMS_PROFILE model registered in settings.py
+
+    Profiles are cached by connection id for SMS_PROFILE_CACHE_TTL seconds, 60 by default, as
+    profiles may be edited in other processes.  Saving or deleting a profile or connection in
+    this process evicts it right away.  Connections without a profile aren't cached, so a new
+    profile is seen as soon as it is created.
     """
     profile_class_name = getattr(settings, 'SMS_PROFILE', None)
 
@@ -24,8 +146,20 @@ def get_sms_profile(connection):
     if not profile_class_name:
         return None
 
-    profile_class = import_from_string(profile_class_name)
+    profile_class = get_profile_class(profile_class_name)
+
+    now = time.time()
+    cached = PROFILES.get(connection.id)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    profile = lookup_sms_profile(profile_class, connection)
+    if profile is not None:
+        PROFILES.set(connection.id, (profile, now + getattr(settings, 'SMS_PROFILE_CACHE_TTL', 60)))
 
+    return profile
+
+def lookup_sms_profile(profile_class, connection):
     # we special case the RapidSMS Contact case, creating them lazily as needed
     if profile_class == Contact:
         if not connection.contact:
@@ -35,13 +169,28 @@ def get_sms_profile(connection):
         return connection.contact
 
     else:
-        # see if we can find a match for that connection
-        matches = profile_class.objects.filter(connection=connection)
+        # see if we can find a match for that connection, we only need the one
+        matches = list(profile_class.objects.filter(connection=connection)[:1])
         if matches:
             return matches[0]
         else:
             return None
 
+def get_sms_users_group_id():
+    """
+    Returns the id of our "SMS Users" group, creating it if necessary.  This isn't cached across
+    calls, as the group may be deleted and recreated under a new id at any time, bulk callers look
+    it up once per call instead.
+    """
+    group_ids = list(Group.objects.filter(name=SMS_USERS_GROUP).values_list('id', flat=True)[:1])
+    if group_ids:
+        return group_ids[0]
+
+    (sms_users, created) = Group.objects.get_or_create(name=SMS_USERS_GROUP)
+    return sms_users.id
+
+def get_connection_username(connection):
+    return "%s_%s" % (connection.backend.name, connection.identity)
 
 def get_connection_user(connection):
     """
@@ -49,21 +198,209 @@ def get_connection_user(connection):
     a special group of "SMS Users" if one is not already present.  The username will be in the format:
            [backend_name]_[phone_number]
     """
-    username = "%s_%s" % (connection.backend.name, connection.identity)
-
-    (sms_users, created) = Group.objects.get_or_create(name="SMS Users")
-    existing = User.objects.filter(username=username)
+    username = get_connection_username(connection)
+    existing = list(User.objects.filter(username=username)[:1])
 
     if not existing:
         user = User.objects.create_user(username)
-        user.groups.add(sms_users)
+        user.groups.add(get_sms_users_group_id())
 
     else:
         user = existing[0]
 
     return user
-        
 
-    
-    
-    
+@transaction.commit_on_success
+def get_connection_users(connections, batch_size=500):
+    """
+    Bulk version of get_connection_user, returns a list of the users for the passed in connections,
+    in the same order, creating the missing ones and adding them to the "SMS Users" group.  This
+    is done batch_size connections at a time with a handful of queries per batch, all in a single
+    transaction.  Note that as users are bulk created, no post_save signals are sent for them.
+    """
+    return lookup_connection_users(connections, batch_size)
+
+def lookup_connection_users(connections, batch_size=500):
+    """
+    Same as get_connection_users, but for callers already managing their own transaction
+    """
+    group_id = None
+    Membership = User.groups.through
+
+    # connections sharing a backend and identity map to the same user
+    usernames = [get_connection_username(connection) for connection in connections]
+    users = dict()
+
+    for start in range(0, len(usernames), batch_size):
+        batch = set(usernames[start:start + batch_size]) - set(users.keys())
+        if not batch:
+            continue
+
+        for user in User.objects.filter(username__in=batch):
+            users[user.username] = user
+
+        missing = [username for username in batch if not username in users]
+        if not missing:
+            continue
+
+        new_users = []
+        for username in missing:
+            user = User(username=username)
+            user.set_unusable_password()
+            new_users.append(user)
+
+        User.objects.bulk_create(new_users)
+
+        # looked up once we need it, and then only once per call
+        if group_id is None:
+            group_id = get_sms_users_group_id()
+
+        # bulk_create doesn't give us ids, so read our new users back
+        created = list(User.objects.filter(username__in=missing))
+        Membership.objects.bulk_create([Membership(user_id=user.id, group_id=group_id) for user in created])
+
+        for user in created:
+            users[user.username] = user
+
+    return [users[username] for username in usernames]
+
+class MessageContext(object):
+    """
+    Lazily resolves and remembers the things our apps need to know about an incoming message,
+    so that however many apps look at it, each is only looked up once per message.  Use
+    get_message_context() to get the context attached to a message.
+
+    Apps can remember their own things using memoize(), ie:
+
+           car = context.memoize('car', lambda: Car.for_connection(message.connection))
+    """
+    def __init__(self, message):
+        self.message = message
+        self.values = dict()
+
+    def memoize(self, name, resolve):
+        """
+        Returns the value remembered by the passed in name, calling resolve to get it the first time
+        """
+        value = self.values.get(name, MISSING)
+        if value is MISSING:
+            value = resolve()
+            self.values[name] = value
+
+        return value
+
+    def set(self, name, value):
+        """
+        Overrides the value remembered by the passed in name, ie: when an app changes it
+        """
+        self.values[name] = value
+
+    def get_profile(self):
+        return self.memoize('profile', lambda: get_sms_profile(self.message.connection))
+
+    def get_user(self):
+        return self.memoize('user', lambda: get_connection_user(self.message.connection))
+
+    def get_identity(self):
+        return self.memoize('identity', lambda: normalize_identity(self.message.connection.identity))
+
+    def get_language(self):
+        """
+        The language to respond in, that of the profile if there is one, our DEFAULT_SMS_LANGUAGE otherwise
+        """
+        return self.memoize('language', self._get_language)
+
+    def _get_language(self):
+        profile = self.profile
+        if profile and getattr(profile, 'language', None):
+            return profile.language
+
+        return getattr(settings, 'DEFAULT_SMS_LANGUAGE', 'en_us')
+
+    def activate_language(self, language=None):
+        """
+        Activates the passed in language, or our language if none is passed in, unless it is
+        already the one activated for this message by another app
+        """
+        activate(language or self.language, self.values)
+
+    def get_keyword(self):
+        """
+        The first word of the message, lowercased, or None for empty messages
+        """
+        return self.memoize('keyword', self._get_keyword)
+
+    def _get_keyword(self):
+        word = Parser(self.message.text).next_word()
+        if word:
+            return word.lower()
+
+        return None
+
+    profile = property(get_profile)
+    user = property(get_user)
+    identity = property(get_identity)
+    language = property(get_language)
+    keyword = property(get_keyword)
+
+def get_message_context(message):
+    """
+    Returns the MessageContext for the passed in message, creating and attaching it if necessary
+    """
+    context = getattr(message, 'nsms_context', None)
+    if context is None:
+        context = MessageContext(message)
+        message.nsms_context = context
+
+    return context
+
+def handle_message(db_message, text=None, replayed=True):
+    """
+    Runs the incoming message phases of the router's apps for a message that is already in our
+    database, ie: one our apps held on to earlier, instead of having the router create a new one.
+    The text of the message can be overridden, and the message is marked as replayed, with the
+    passed in value, so that the apps which held on to it know to let it through this time.
+    """
+    from rapidsms.messages.incoming import IncomingMessage
+    from rapidsms_httprouter.router import get_router
+    import traceback
+
+    router = get_router()
+
+    msg = IncomingMessage(db_message.connection, text or db_message.text, db_message.date)
+    msg.db_message = db_message
+    msg.replayed = replayed
+
+    # the same phases, with the same short-circuiting, as the router's handle_incoming
+    try:
+        for phase in router.incoming_phases:
+            if phase == "default" and msg.handled:
+                break
+
+            for app in router.apps:
+                handled = False
+                try:
+                    handled = getattr(app, phase)(msg)
+                except Exception:
+                    traceback.print_exc()
+                    app.exception()
+
+                if phase == "filter" and handled is True:
+                    raise StopIteration
+                elif phase == "handle" and handled is True:
+                    msg.handled = True
+                    break
+                elif phase == "default" and handled is True:
+                    break
+
+    except StopIteration:
+        pass
+
+    db_message.status = 'H'
+    db_message.save()
+
+    while msg.responses:
+        router.handle_outgoing(msg.responses.pop(0), db_message)
+
+    msg.processed = True
+    return db_message
@@ -0,0 +1,137 @@
+import itertools
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from rapidsms.models import Contact, Connection
+from nsms.utils import normalize_identity, get_identities, lookup_connection_users
+
+def read_chunks(rows, chunk_size):
+    """
+    Yields lists of at most chunk_size rows from the passed in iterable, never reading more
+    than one chunk ahead
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def get_language(language):
+    """
+    Returns the passed in language if it is one of our LANGUAGES, our DEFAULT_SMS_LANGUAGE otherwise
+    """
+    language = (language or '').strip().lower()
+    for (code, name) in getattr(settings, 'LANGUAGES', ()):
+        if code.lower() == language:
+            return code
+
+    return getattr(settings, 'DEFAULT_SMS_LANGUAGE', 'en_us')
+
+class ImportConflict(Exception):
+    """
+    Raised when we can't tell which of the contacts we bulk created are ours
+    """
+    pass
+
+def create_contacts(contacts, bulk=True):
+    """
+    Creates the passed in contacts and returns them with their ids.  As bulk_create doesn't give
+    us ids, we read back the contacts created after our insert and check they are ours, raising
+    ImportConflict if anybody else created contacts at the same time.  With bulk set to False
+    contacts are saved one at a time.
+    """
+    if not bulk:
+        for contact in contacts:
+            contact.save()
+        return contacts
+
+    last_id = Contact.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    Contact.objects.bulk_create(contacts)
+
+    created = list(Contact.objects.filter(id__gt=last_id).order_by('id')[:len(contacts) + 1])
+    if len(created) != len(contacts):
+        raise ImportConflict()
+
+    for (contact, new) in zip(contacts, created):
+        if contact.name != new.name or contact.language != new.language:
+            raise ImportConflict()
+
+    return created
+
+@transaction.commit_on_success
+def import_chunk(rows, backend, create_users=True, bulk=True):
+    """
+    Imports a chunk of (phone, name, language) rows for the passed in backend, returning a tuple of
+    the number of (created, existing, invalid) rows.  Phone numbers are normalized and looked up
+    against our existing connections in one query, under any of the forms they may have been
+    created with, then new contacts, connections and users are bulk created.  The whole chunk is
+    rolled back if anything goes wrong.
+    """
+    invalid = 0
+    identities = []
+    contacts = dict()
+
+    # the normalized identity for each of the forms a connection for it may exist under
+    forms = dict()
+
+    for row in rows:
+        row = list(row) + ['', '']
+        raw = row[0].strip()
+        if not normalize_identity(raw):
+            invalid += 1
+            continue
+
+        (identity, identity_forms) = get_identities(raw)
+
+        # the same number twice in our chunk, the first one wins
+        if identity in contacts:
+            continue
+
+        identities.append(identity)
+        contacts[identity] = Contact(name=row[1].strip(), language=get_language(row[2]))
+        for form in identity_forms:
+            forms[form] = identity
+
+    matches = Connection.objects.filter(backend=backend, identity__in=forms.keys())
+    existing = set([forms.get(form) for form in matches.values_list('identity', flat=True)])
+    identities = [identity for identity in identities if not identity in existing]
+
+    if identities:
+        created = create_contacts([contacts[identity] for identity in identities], bulk)
+        connections = [Connection(backend=backend, identity=identity, contact_id=contact.id)
+                       for (identity, contact) in zip(identities, created)]
+        Connection.objects.bulk_create(connections)
+
+        if create_users:
+            lookup_connection_users(connections)
+
+    return (len(identities), len(rows) - len(identities) - invalid, invalid)
+
+def import_contacts(rows, backend, chunk_size=1000, create_users=True, progress=None):
+    """
+    Imports the passed in (phone, name, language) rows for the passed in backend, chunk_size rows
+    at a time, each in its own transaction.  Rows can be any iterable, ie: a csv reader, so that
+    memory stays flat whatever the number of rows.  The progress callable, if any, is called after
+    each chunk with our running totals.  Returns a dict of the number of rows created, existing
+    and invalid.
+    """
+    totals = dict(rows=0, created=0, existing=0, invalid=0)
+
+    for chunk in read_chunks(rows, chunk_size):
+        try:
+            (created, existing, invalid) = import_chunk(chunk, backend, create_users)
+
+        # somebody else was creating contacts at the same time, redo this chunk the slow way
+        except ImportConflict:
+            (created, existing, invalid) = import_chunk(chunk, backend, create_users, bulk=False)
+
+        totals['rows'] += len(chunk)
+        totals['created'] += created
+        totals['existing'] += existing
+        totals['invalid'] += invalid
+
+        if progress:
+            progress(totals)
+
+    return totals